@@ -1,8 +1,8 @@
 # app.py
-from flask import Flask, render_template, request, redirect, session, jsonify, send_from_directory, url_for, flash
+from flask import Flask, Request, render_template, request, redirect, session, jsonify, url_for, flash, Response, stream_with_context
 import sys, os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from ml_model import predict_all_students
+from ml_model import latest_risk_for_teacher
 
 from models import (
     Student,
@@ -16,14 +16,27 @@ from models import (
     Notification,
     TeacherNotification,
     AttendanceModel,
-    TeacherPost
+    TeacherPost,
+    StudentDashboard,
+    TeacherDashboard
 )
 
-from db import execute_query
+from db import execute_query, PoolTimeout
+from email_queue import EmailDispatcher, EMAIL_WORKERS
+import metrics
+from exports import stream_report, report_filename
+import storage
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
+class UploadRequest(Request):
+    # uploaded files are spooled straight into content-addressed storage (storage.py),
+    # hashed and size-checked while the body is read
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return storage.spool(app.config["UPLOAD_FOLDER"])
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = "supersecretkey123"
 app.jinja_env.filters['zip'] = zip
 
@@ -31,6 +44,42 @@ app.jinja_env.filters['zip'] = zip
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# whole request body; the file itself is capped at storage.UPLOAD_MAX_BYTES as it streams in
+app.config["MAX_CONTENT_LENGTH"] = storage.UPLOAD_MAX_BYTES + 1024 * 1024
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    flash(f"❌ File too large (max {storage.UPLOAD_MAX_BYTES // (1024 * 1024)} MB).", "error")
+    return redirect(url_for('student_dashboard'))
+
+# ---------------- EMAIL DISPATCHER ----------------
+# outgoing mail is queued in EmailOutbox and delivered by email_worker.py.
+# `python app.py` also runs EMAIL_WORKERS dispatcher threads in-process (see
+# the bottom of this file); importing the app -- tests, scripts, gunicorn
+# workers -- starts nothing.
+email_dispatcher = None
+
+def start_email_dispatcher():
+    global email_dispatcher
+    if email_dispatcher is None and EMAIL_WORKERS > 0:
+        email_dispatcher = EmailDispatcher().start()
+    return email_dispatcher
+
+# ---------------- METRICS ----------------
+# every request's DB statement count, DB time and connection wait are summed
+# per endpoint and exposed with the per-statement stats at /metrics
+@app.before_request
+def _start_request_metrics():
+    metrics.start_request()
+
+@app.after_request
+def _finish_request_metrics(response):
+    metrics.finish_request(request.endpoint, request.method, response.status_code)
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ---------------- HOME ----------------
 @app.route('/')
@@ -53,10 +102,9 @@ def student_upload():
 
     if file and file.filename != "":
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        file.save(file_path)
+        sha256, size, rel_path = storage.store(app.config["UPLOAD_FOLDER"], file.stream)
 
-        Submission.submit(assignment_id, student_id, filename)
+        Submission.submit(assignment_id, student_id, rel_path, filename, sha256, size)
         flash("✅ Assignment uploaded successfully.", "success")
     else:
         flash("❌ No file selected.", "error")
@@ -139,33 +187,7 @@ def student_dashboard():
         return redirect('/')
 
     sid = session['student_id']
-    student = Student.get_details(sid)
-    courses = Student.show_courses(sid)
-
-    assignments = execute_query("""
-        SELECT 
-            a.id, a.title, a.due_date,
-            s.file_path, s.marks
-        FROM Assignments a
-        JOIN StudentCourses sc ON a.course_id = sc.course_id
-        LEFT JOIN Submissions s ON s.assignment_id = a.id AND s.student_id = %s
-        WHERE sc.student_id = %s
-        ORDER BY a.due_date
-    """, (sid, sid), fetch=True)
-
-    grades = Student.get_course_grades(sid)
-    labels = [g[0] for g in grades]
-    values = [float(g[1]) for g in grades]
-
-    notifications = Notification.get_for_student(sid)
-
-    return render_template("student_dashboard.html",
-                           student=student,
-                           courses=courses,
-                           assignments=assignments,
-                           notifications=notifications,
-                           chart_labels=labels,
-                           chart_data=values)
+    return render_template("student_dashboard.html", **StudentDashboard.load(sid))
 
 # ---------------- STUDENT PROFILE ----------------
 @app.route('/student/profile')
@@ -183,17 +205,67 @@ def update_password():
     return redirect('/student/profile')
 
 # ---------------- EXPORT CSV ----------------
+def _report_response(name, param):
+    """Stream report `name` as a CSV download (?gzip=1 for .csv.gz)."""
+    gzip = request.args.get('gzip') == '1'
+    chunks = stream_report(name, param, gzip=gzip)
+    try:
+        # open the export connection before answering, so "too many exports" is a 503, not a cut-off file
+        first = next(chunks, b"")
+    except PoolTimeout:
+        return "Too many exports in progress, please try again shortly.", 503
+
+    def body():
+        try:
+            yield first
+            yield from chunks
+        finally:
+            chunks.close()
+
+    return Response(
+        stream_with_context(body()),
+        mimetype="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f"attachment; filename={report_filename(name, param, gzip)}"},
+    )
+
 @app.route('/student/export')
 def student_export():
-    Student.export_csv(session['student_id'])
-    return "Your report has been downloaded successfully!"
+    if 'student_id' not in session:
+        return redirect('/')
+    return _report_response("student_grades", session['student_id'])
+
+@app.route('/teacher/export/<report>/<int:course_id>')
+def teacher_export(report, course_id):
+    if 'teacher_id' not in session:
+        return redirect('/')
+    if report not in ("course_gradebook", "attendance_register"):
+        return "Unknown report", 404
+    if course_id not in {c[0] for c in Teacher.get_courses(session['teacher_id']) or []}:
+        return "Not your course", 403
+    return _report_response(report, course_id)
 
 # ---------------- STUDENT NOTIFICATIONS ----------------
 @app.route('/student/notifications')
 def student_notifications():
     if 'student_id' not in session:
         return redirect('/')
-    return render_template('student_notifications.html', notifications=Student.get_notifications(session['student_id']))
+    sid = session['student_id']
+    notifications, next_cursor = Student.get_notifications(sid, before=request.args.get('before'))
+    # only the rows on this page have been seen; older unread ones stay unread
+    Notification.mark_read(sid, ids=[n[2] for n in notifications if n[3]])
+    if request.args.get('format') == 'json':
+        return jsonify(_notification_page_json(notifications, next_cursor, Notification.unread_count(sid)))
+    return render_template('notifications.html', notifications=notifications, next_cursor=next_cursor,
+                           unread=Notification.unread_count(sid), feed_url=url_for('student_notifications'),
+                           back_url=url_for('student_dashboard'))
+
+def _notification_page_json(rows, next_cursor, unread):
+    return {
+        "notifications": [{"id": nid, "message": msg, "created_at": created, "unread": unread_flag}
+                          for msg, created, nid, unread_flag in rows],
+        "next": next_cursor,
+        "unread": unread,
+    }
 
 # ---------------- STUDENT SUBMISSIONS ----------------
 @app.route('/student/submissions')
@@ -242,62 +314,13 @@ def teacher_dashboard():
 
     tid = session['teacher_id']
 
-    teacher = execute_query(
-        "SELECT id, name FROM Teachers WHERE id=%s",
-        (tid,), fetch=True
-    )
-    teacher = teacher[0] if teacher else None
-
-    students = execute_query("""
-        SELECT s.id, s.name, c.course_name, c.id
-        FROM Students s
-        JOIN StudentCourses sc ON s.id = sc.student_id
-        JOIN Courses c ON sc.course_id = c.id
-        JOIN TeacherCourses tc ON c.id = tc.course_id
-        WHERE tc.teacher_id = %s
-    """, (tid,), fetch=True)
-
-    courses = Teacher.get_courses(tid)
-
-    assignments = execute_query("""
-        SELECT id, title, due_date
-        FROM Assignments
-        WHERE teacher_id = %s
-        ORDER BY due_date DESC
-    """, (tid,), fetch=True)
-
-    posts = TeacherPost.get_for_teacher(tid)
-
-    # ---------------------- ATTENDANCE SUMMARY ----------------------
-    attendance_summary = []
-    for cid, cname in courses or []:
-        data = execute_query("""
-            SELECT s.name, ROUND(AVG(a.present)*100, 2)
-            FROM Attendance a
-            JOIN Students s ON a.student_id = s.id
-            WHERE a.course_id = %s
-            GROUP BY s.name
-            ORDER BY s.name
-        """, (cid,), fetch=True)
-
-        attendance_summary.append({
-            'course_id': cid,
-            'course_name': cname,
-            'records': [
-                {'name': r[0], 'percent': float(r[1] or 0)}
-                for r in data or []
-            ]
-        })
-
-    notifications = TeacherNotification.get_for_teacher(tid)
+    # one connection, one snapshot, one grouped attendance query
+    data = TeacherDashboard.load(tid)
 
     # ------------------------- ML PREDICTION SECTION -------------------------
+    # read the cached latest-risk snapshot; rescoring happens in the background
     try:
-        ml_predictions = predict_all_students(threshold=0.6, notify=False)
-        at_risk_list = [
-            p for p in ml_predictions
-            if p["risk_label"] in ("high", "medium")
-        ]
+        at_risk_list = latest_risk_for_teacher(tid, labels=("high", "medium"))
     except Exception as e:
         print("ML ERROR:", e)
         at_risk_list = []
@@ -305,16 +328,23 @@ def teacher_dashboard():
 
     return render_template(
         'teacher_dashboard.html',
-        teacher=teacher,
-        students=students,
-        courses=courses,
-        assignments=assignments,
-        posts=posts,
-        notifications=notifications,
-        attendance_summary=attendance_summary,
+        **data,
         at_risk_list=at_risk_list      # <-- SEND TO FRONTEND
     )
 
+# ---------------- TEACHER NOTIFICATIONS ----------------
+@app.route('/teacher/notifications')
+def teacher_notifications():
+    if 'teacher_id' not in session:
+        return redirect('/')
+    tid = session['teacher_id']
+    notifications, next_cursor = TeacherNotification.get_for_teacher(tid, before=request.args.get('before'))
+    TeacherNotification.mark_read(tid, ids=[n[2] for n in notifications if n[3]])
+    if request.args.get('format') == 'json':
+        return jsonify(_notification_page_json(notifications, next_cursor, TeacherNotification.unread_count(tid)))
+    return render_template('notifications.html', notifications=notifications, next_cursor=next_cursor,
+                           unread=TeacherNotification.unread_count(tid), feed_url=url_for('teacher_notifications'),
+                           back_url=url_for('teacher_dashboard'))
 
 
 # ---------------- CREATE ASSIGNMENT ----------------
@@ -354,12 +384,7 @@ def teacher_add_course():
 # ---------------- VIEW SUBMISSIONS ----------------
 @app.route('/teacher/submissions/<int:assignment_id>')
 def view_submissions(assignment_id):
-    submissions = execute_query("""
-        SELECT s.id, st.name, s.file_path, s.submitted_at, s.marks
-        FROM Submissions s
-        JOIN Students st ON s.student_id = st.id
-        WHERE s.assignment_id=%s
-    """, (assignment_id,), fetch=True)
+    submissions = Submission.get_for_assignment(assignment_id)
 
     assignment = execute_query("SELECT title, description, due_date FROM Assignments WHERE id=%s", (assignment_id,), fetch=True)
     return render_template('teacher_submissions.html', submissions=submissions, assignment=assignment[0] if assignment else None)
@@ -391,8 +416,8 @@ def teacher_mark_attendance(course_id):
         if k.startswith("present_"):
             sid = int(k.split("_")[1])
             records.append({'student_id': sid, 'present': 1})
-    AttendanceModel.mark_attendance_bulk(course_id, date, records)
-    flash("Attendance saved!", "success")
+    saved = AttendanceModel.mark_attendance_bulk(course_id, date, records)
+    flash(f"Attendance saved! ({saved['inserted']} new, {saved['updated']} updated)", "success")
     return redirect(url_for('teacher_attendance_view', course_id=course_id, date=date))
 
 # ---------------- ML PREDICT ----------------
@@ -408,8 +433,13 @@ def run_ml_predictions():
 # ---------------- SERVE UPLOADS ----------------
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename, as_attachment=True)
+    # ?name= is the original file name for Content-Disposition (storage paths are hashes)
+    name = secure_filename(request.args.get('name', '')) or None
+    return storage.download_response(app.config["UPLOAD_FOLDER"], filename, name)
 
 # ---------------- MAIN ----------------
 if __name__ == '__main__':
+    # the debug reloader re-runs this file in a child process; only that child serves and sends mail
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_email_dispatcher()
     app.run(debug=True)
@@ -0,0 +1,86 @@
+# bench_attendance_sheet.py
+# Time the attendance sheet query (old correlated subqueries vs the LEFT JOIN)
+# on a scratch course with 90 and 365 days of history.
+# Usage: python bench_attendance_sheet.py [students] [runs]
+# The scratch course and its rows are deleted afterwards.
+import sys
+import time
+from datetime import date
+from db import execute_query
+from models import AttendanceModel
+
+HISTORY_DAYS = [90, 365]
+
+LEGACY_Q = """
+SELECT
+    s.id,
+    s.name,
+    COALESCE((
+        SELECT present
+        FROM Attendance a
+        WHERE a.student_id = s.id
+          AND a.course_id = %s
+          AND DATE(a.date_marked) = %s
+        LIMIT 1
+    ), 0) AS present,
+    (
+        SELECT id
+        FROM Attendance a
+        WHERE a.student_id = s.id
+          AND a.course_id = %s
+          AND DATE(a.date_marked) = %s
+        LIMIT 1
+    ) AS record_exists
+FROM Students s
+JOIN StudentCourses sc ON s.id = sc.student_id
+WHERE sc.course_id = %s
+ORDER BY s.name
+"""
+
+def legacy(course_id, day):
+    return execute_query(LEGACY_Q, (course_id, day, course_id, day, course_id), fetch=True)
+
+def _median_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main(n_students, runs):
+    student_ids = [r[0] for r in execute_query("SELECT id FROM Students ORDER BY id LIMIT %s", (n_students,), fetch=True) or []]
+    if not student_ids:
+        print("❌ Need rows in Students.")
+        return
+
+    course_id = execute_query("INSERT INTO Courses (course_name) VALUES ('bench scratch') RETURNING id", returning=True)
+    today = date.today().isoformat()
+    try:
+        execute_query("INSERT INTO StudentCourses (student_id, course_id) SELECT unnest(%s::int[]), %s",
+                      (student_ids, course_id))
+        print(f"{'history':>8} | {'legacy ms':>10} | {'join ms':>8}")
+        loaded = 0
+        for days in HISTORY_DAYS:
+            # extend the scratch history to `days` days back from today
+            execute_query("""
+                INSERT INTO Attendance (student_id, course_id, date_marked, present, created_at)
+                SELECT sid, %s, CURRENT_DATE - d, (random() < 0.85)::int, NOW()
+                FROM unnest(%s::int[]) AS sid, generate_series(%s, %s) AS d
+            """, (course_id, student_ids, loaded, days - 1))
+            loaded = days
+            execute_query("ANALYZE Attendance")
+            legacy_ms = _median_ms(lambda: legacy(course_id, today), runs)
+            join_ms = _median_ms(lambda: AttendanceModel.get_course_attendance_for_date(course_id, today), runs)
+            assert sorted(legacy(course_id, today)) == sorted(AttendanceModel.get_course_attendance_for_date(course_id, today))
+            print(f"{days:>7}d | {legacy_ms:>10.2f} | {join_ms:>8.2f}")
+    finally:
+        execute_query("DELETE FROM Attendance WHERE course_id = %s", (course_id,))
+        execute_query("DELETE FROM StudentCourses WHERE course_id = %s", (course_id,))
+        execute_query("DELETE FROM Courses WHERE id = %s", (course_id,))
+
+if __name__ == "__main__":
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(n_students, runs)
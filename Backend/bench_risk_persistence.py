@@ -0,0 +1,74 @@
+# bench_risk_persistence.py
+# Compare the old row-by-row StudentRisk writes with the bulk writer.
+# Usage: python bench_risk_persistence.py [sizes...]   (default: 1000 10000 100000)
+# Rows are written for existing student ids (cycled) and deleted again afterwards;
+# the StudentRiskLatest snapshot the bulk writer upserts is restored after each run.
+import sys
+import time
+from psycopg2.extras import execute_values
+from db import execute_query, transaction
+from ml_model import save_risk_results
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+def _fake_results(student_ids, n):
+    results = []
+    for i in range(n):
+        score = (i % 100) / 100.0
+        label = "high" if score >= 0.75 else "medium" if score >= 0.5 else "low"
+        results.append({"student_id": student_ids[i % len(student_ids)], "risk_score": score, "risk_label": label})
+    return results
+
+def row_by_row(results, threshold=0.6):
+    """The pre-bulk path: INSERT, then SELECT notified, per student, each on its own commit."""
+    for r in results:
+        execute_query(
+            "INSERT INTO StudentRisk (student_id, risk_score, risk_label, evaluated_at) VALUES (%s, %s, %s, NOW())",
+            (r["student_id"], r["risk_score"], r["risk_label"])
+        )
+        if r["risk_score"] >= threshold:
+            execute_query(
+                "SELECT notified FROM StudentRisk WHERE student_id=%s ORDER BY id DESC LIMIT 1",
+                (r["student_id"],), fetch=True
+            )
+
+def bulk(results):
+    save_risk_results(results)
+
+def _snapshot_latest():
+    return execute_query(
+        "SELECT student_id, risk_score, risk_label, evaluated_at FROM StudentRiskLatest", fetch=True) or []
+
+def _cleanup(max_id, latest):
+    """Drop the benchmark's StudentRisk rows and put the pre-run snapshot back."""
+    with transaction() as cur:
+        cur.execute("DELETE FROM StudentRisk WHERE id > %s", (max_id,))
+        cur.execute("DELETE FROM StudentRiskLatest")
+        execute_values(
+            cur,
+            "INSERT INTO StudentRiskLatest (student_id, risk_score, risk_label, evaluated_at) VALUES %s",
+            latest, page_size=1000
+        )
+
+def main(sizes):
+    student_ids = [r[0] for r in execute_query("SELECT id FROM Students ORDER BY id", fetch=True) or []]
+    if not student_ids:
+        print("❌ Need at least one row in Students.")
+        return
+    latest = _snapshot_latest()
+
+    print(f"{'rows':>8} | {'row-by-row (s)':>15} | {'bulk (s)':>10} | {'speedup':>8}")
+    for n in sizes:
+        results = _fake_results(student_ids, n)
+        timings = {}
+        for name, fn in (("row", row_by_row), ("bulk", bulk)):
+            max_id = execute_query("SELECT COALESCE(MAX(id), 0) FROM StudentRisk", fetch=True)[0][0]
+            start = time.time()
+            fn(results)
+            timings[name] = time.time() - start
+            _cleanup(max_id, latest)
+        speedup = timings["row"] / timings["bulk"] if timings["bulk"] else float("inf")
+        print(f"{n:>8} | {timings['row']:>15.3f} | {timings['bulk']:>10.3f} | {speedup:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
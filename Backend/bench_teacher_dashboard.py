@@ -0,0 +1,91 @@
+# bench_teacher_dashboard.py
+# Query count, connection checkouts and latency per teacher dashboard render:
+# the old per-course loop vs TeacherDashboard.load().
+# Usage: python bench_teacher_dashboard.py <teacher_id> [renders]
+import sys
+import time
+from db import execute_query, statement_stats, pool_stats
+from models import TeacherDashboard
+
+def legacy_load(tid):
+    """
+    The dashboard data path before the single loader (separate connection per
+    query), with the original queries inlined so later model changes do not move the baseline.
+    """
+    teacher = execute_query("SELECT id, name FROM Teachers WHERE id=%s", (tid,), fetch=True)
+    students = execute_query("""
+        SELECT s.id, s.name, c.course_name, c.id
+        FROM Students s
+        JOIN StudentCourses sc ON s.id = sc.student_id
+        JOIN Courses c ON sc.course_id = c.id
+        JOIN TeacherCourses tc ON c.id = tc.course_id
+        WHERE tc.teacher_id = %s
+    """, (tid,), fetch=True)
+    courses = execute_query("""
+        SELECT c.id, c.course_name
+        FROM Courses c
+        JOIN TeacherCourses tc ON c.id = tc.course_id
+        WHERE tc.teacher_id = %s
+    """, (tid,), fetch=True)
+    assignments = execute_query(
+        "SELECT id, title, due_date FROM Assignments WHERE teacher_id = %s ORDER BY due_date DESC",
+        (tid,), fetch=True
+    )
+    posts = execute_query("""
+        SELECT id, message, to_char(created_at,'YYYY-MM-DD HH24:MI')
+        FROM TeacherPosts
+        WHERE teacher_id = %s
+        ORDER BY created_at DESC
+    """, (tid,), fetch=True)
+    summary = []
+    for cid, cname in courses or []:
+        data = execute_query("""
+            SELECT s.name, ROUND(AVG(a.present)*100, 2)
+            FROM Attendance a
+            JOIN Students s ON a.student_id = s.id
+            WHERE a.course_id = %s
+            GROUP BY s.name
+            ORDER BY s.name
+        """, (cid,), fetch=True)
+        summary.append((cid, cname, data))
+    # the unpaged feed: every notification the teacher ever received
+    notifications = execute_query("""
+        SELECT message, to_char(created_at,'YYYY-MM-DD HH24:MI')
+        FROM TeacherNotifications
+        WHERE teacher_id=%s
+        ORDER BY created_at DESC
+    """, (tid,), fetch=True)
+    return teacher, students, courses, assignments, posts, summary, notifications
+
+def _total_calls():
+    return sum(st["calls"] for st in statement_stats().values())
+
+def measure(fn, tid, renders):
+    fn(tid)  # warm-up (pool, schema checks)
+    timings = []
+    calls_before = _total_calls()
+    checkouts_before = pool_stats().get("checkouts", 0)
+    for _ in range(renders):
+        start = time.perf_counter()
+        fn(tid)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "queries_per_render": (_total_calls() - calls_before) / renders,
+        "connections_per_render": (pool_stats().get("checkouts", 0) - checkouts_before) / renders,
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python bench_teacher_dashboard.py <teacher_id> [renders]")
+        sys.exit(1)
+    tid = int(sys.argv[1])
+    renders = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"{'path':>8} | {'queries':>8} | {'conns':>6} | {'p50 ms':>8} | {'p95 ms':>8}")
+    for name, fn in (("legacy", legacy_load), ("loader", TeacherDashboard.load)):
+        r = measure(fn, tid, renders)
+        print(f"{name:>8} | {r['queries_per_render']:>8.1f} | {r['connections_per_render']:>6.1f} | "
+              f"{r['p50_ms']:>8.2f} | {r['p95_ms']:>8.2f}")
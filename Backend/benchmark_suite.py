@@ -0,0 +1,191 @@
+# benchmark_suite.py (repeatable micro-benchmarks for the model and DB hot paths)
+#
+#   python benchmark_suite.py --sizes 1000,10000       seed <PG_DB>_bench_<n> databases (once) and run
+#   python benchmark_suite.py                          run against PG_DB as it is
+#   python benchmark_suite.py --compare old.json new.json
+#
+# Each benchmark reports p50/p95/mean latency, queries per call (from
+# db.statement_stats) and peak Python memory (tracemalloc, on a separate
+# run so it does not skew the timings). Results are written as JSON under
+# bench_results/, named after the current commit, for comparison between
+# commits. Benchmarks write to the database (risk rows, attendance for a
+# far-past date, outbox rows), so point them at a scratch database.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import date, datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "bench_results")
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def _total_queries(statement_stats):
+    return sum(st["calls"] for st in statement_stats().values())
+
+def _percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))]
+
+def measure(fn, reps, statement_stats):
+    fn()  # warm-up: pool, schema checks, model registry
+    timings = []
+    q_before = _total_queries(statement_stats)
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    queries = (_total_queries(statement_stats) - q_before) / reps
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "reps": reps,
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": queries,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def run_benchmarks(reps):
+    # imported here so ml_model's MODEL_DIR lands in the scratch working directory
+    from db import execute_query, statement_stats
+    from models import AttendanceModel, Notification, StudentDashboard, TeacherDashboard
+    from ml_model import predict_all_students, train_and_save_model, latest_risk_for_teacher
+
+    row = execute_query("""
+        SELECT tc.teacher_id, tc.course_id
+        FROM TeacherCourses tc
+        JOIN StudentCourses sc ON sc.course_id = tc.course_id
+        GROUP BY tc.teacher_id, tc.course_id
+        ORDER BY COUNT(*) DESC
+        LIMIT 1
+    """, fetch=True)
+    if not row:
+        raise SystemExit("❌ Need at least one teacher with enrolled students (run seed_data.py).")
+    teacher_id, course_id = row[0]
+    student_id = execute_query("SELECT student_id FROM StudentCourses WHERE course_id=%s LIMIT 1",
+                               (course_id,), fetch=True)[0][0]
+    roster = [r[0] for r in execute_query("SELECT student_id FROM StudentCourses WHERE course_id=%s",
+                                          (course_id,), fetch=True)]
+    sheet_day = "2000-01-01"
+    sheet = [{"student_id": sid, "present": i % 5 != 0} for i, sid in enumerate(roster)]
+
+    def teacher_dashboard():
+        TeacherDashboard.load(teacher_id)
+        latest_risk_for_teacher(teacher_id, labels=("high", "medium"))
+
+    benches = [
+        ("train_and_save_model", train_and_save_model, max(1, reps // 5)),
+        ("predict_all_students", lambda: predict_all_students(notify=False), max(1, reps // 5)),
+        ("mark_attendance_bulk", lambda: AttendanceModel.mark_attendance_bulk(course_id, sheet_day, sheet), reps),
+        ("get_course_attendance_for_date",
+         lambda: AttendanceModel.get_course_attendance_for_date(course_id, date.today().isoformat()), reps),
+        ("student_dashboard", lambda: StudentDashboard.load(student_id), reps),
+        ("teacher_dashboard", teacher_dashboard, reps),
+        ("notification_fan_out", lambda: Notification.create_for_course(course_id, "benchmark"), max(1, reps // 5)),
+    ]
+
+    results = {}
+    for name, fn, n in benches:
+        results[name] = measure(fn, n, statement_stats)
+        r = results[name]
+        print(f"  {name:<32} p50 {r['p50_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  "
+              f"{r['queries']:>7.1f} q  {r['peak_kb']:>9.1f} KB")
+
+    # keep the scratch database tidy between runs
+    execute_query("DELETE FROM Notifications WHERE message = 'benchmark'")
+    execute_query("DELETE FROM EmailOutbox WHERE body = 'benchmark'")
+
+    n_students = execute_query("SELECT COUNT(*) FROM Students", fetch=True)[0][0]
+    return {"students": n_students, "teacher_id": teacher_id, "course_id": course_id,
+            "roster": len(roster), "results": results}
+
+def _write(report, label):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{report['commit']}_{label}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"📁 Wrote {path}")
+    return path
+
+def run_current(reps):
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+    report = {"commit": _git_commit(), "database": os.getenv("PG_DB"),
+              "started_at": datetime.now().isoformat(timespec="seconds")}
+    report.update(run_benchmarks(reps))
+    return report
+
+def _ensure_sized_db(base_env, size):
+    """Create, migrate and seed <PG_DB>_bench_<size> unless it already exists."""
+    from db import get_conn
+    name = f"{base_env.get('PG_DB', 'yourdb')}_bench_{size}"
+    conn = get_conn()
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+    exists = cur.fetchone() is not None
+    if not exists:
+        cur.execute(f'CREATE DATABASE "{name}"')
+    conn.close()
+
+    env = dict(base_env, PG_DB=name)
+    if not exists:
+        print(f"🌱 Seeding {name}...")
+        subprocess.check_call([sys.executable, os.path.join(HERE, "migrations.py"), "upgrade"], env=env)
+        subprocess.check_call([sys.executable, os.path.join(HERE, "seed_data.py"),
+                               "--students", str(size), "--defer-indexes"], env=env)
+    return env
+
+def run_sizes(sizes, reps):
+    paths = []
+    for size in sizes:
+        env = _ensure_sized_db(dict(os.environ), size)
+        print(f"⏱ Benchmarking {env['PG_DB']}")
+        subprocess.check_call([sys.executable, os.path.abspath(__file__), "--reps", str(reps),
+                               "--label", str(size)], env=env)
+        paths.append(os.path.join(RESULTS_DIR, f"{_git_commit()}_{size}.json"))
+    return paths
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{'benchmark':<32} {'p50 old':>9} {'p50 new':>9} {'ratio':>7} {'q old':>7} {'q new':>7}")
+    for name, r in new["results"].items():
+        o = old["results"].get(name)
+        if not o:
+            continue
+        ratio = r["p50_ms"] / o["p50_ms"] if o["p50_ms"] else float("inf")
+        flag = "  ⚠" if ratio > 1.2 or r["queries"] > o["queries"] else ""
+        print(f"{name:<32} {o['p50_ms']:>9.2f} {r['p50_ms']:>9.2f} {ratio:>6.2f}x "
+              f"{o['queries']:>7.1f} {r['queries']:>7.1f}{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model and DB hot paths.")
+    parser.add_argument("--sizes", help="comma separated student counts, e.g. 1000,10000,100000")
+    parser.add_argument("--reps", type=int, default=20)
+    parser.add_argument("--label", default="current", help="suffix of the JSON file name")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.sizes:
+        run_sizes([int(s) for s in args.sizes.split(",")], args.reps)
+    else:
+        _write(run_current(args.reps), args.label)
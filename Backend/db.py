@@ -1,7 +1,15 @@
 # db.py (Postgres version)
 import os
 import re
+import time
+import hashlib
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
+from psycopg2 import extensions
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 
@@ -13,6 +21,25 @@ PG_DB = os.getenv("PG_DB", "yourdb")
 PG_USER = os.getenv("PG_USER", "youruser")
 PG_PASS = os.getenv("PG_PASSWORD", "")
 
+# ---------------- connection pool settings ----------------
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", 1))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", 10))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", 10))                  # seconds to wait for a free connection
+PG_POOL_HEALTHCHECK_IDLE = float(os.getenv("PG_POOL_HEALTHCHECK_IDLE", 30))  # ping connections idle longer than this
+
+# ---------------- statement cache settings ----------------
+PG_SQL_CACHE_SIZE = int(os.getenv("PG_SQL_CACHE_SIZE", 256))        # translated statements kept in memory
+PG_PREPARE = os.getenv("PG_PREPARE", "0") == "1"                    # server-side prepared statements on/off
+PG_PREPARE_THRESHOLD = int(os.getenv("PG_PREPARE_THRESHOLD", 3))    # executions before a statement is PREPAREd
+PG_STATS_SIZE = int(os.getenv("PG_STATS_SIZE", 1000))               # statements with counters kept (least recent dropped)
+
+# ---------------- streaming settings ----------------
+PG_ITERSIZE = int(os.getenv("PG_ITERSIZE", 2000))                   # rows per round trip from server-side cursors
+PG_STREAM_MAX = int(os.getenv("PG_STREAM_MAX", 4))                  # concurrent dedicated (non-pooled) stream connections
+
+# ---------------- instrumentation settings ----------------
+PG_SLOW_QUERY_MS = float(os.getenv("PG_SLOW_QUERY_MS", 200))        # log statements slower than this (0 = off)
+
 def _translate_oracle_sql(q):
     """
     Do simple translations from common Oracle constructs to Postgres:
@@ -32,6 +59,192 @@ def _translate_oracle_sql(q):
     q = q.replace("TRUNC(", "DATE(")  # careful: may need manual checks for complex uses
     return q
 
+# ---------------- STATEMENT CACHE ----------------
+class _StatementCache:
+    """Bounded LRU of raw query text -> translated Postgres text."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        """Returns (translated_sql, was_cached)."""
+        with self._lock:
+            q = self._data.get(query)
+            if q is not None:
+                self._data.move_to_end(query)
+                return q, True
+        q = _translate_oracle_sql(query)
+        with self._lock:
+            self._data[query] = q
+            self._data.move_to_end(query)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return q, False
+
+    def __len__(self):
+        return len(self._data)
+
+_sql_cache = _StatementCache(PG_SQL_CACHE_SIZE)
+_stats_lock = threading.Lock()
+_statement_stats = OrderedDict()            # translated sql -> counters, LRU-bounded by PG_STATS_SIZE
+_prepared = weakref.WeakKeyDictionary()     # connection -> {translated sql: statement name}
+_unpreparable = OrderedDict()               # translated sql whose PREPARE failed; never retried
+_prepare_seq = itertools.count(1)
+
+_PREPARABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+def _bump(q, **counts):
+    with _stats_lock:
+        st = _statement_stats.get(q)
+        if st is None:
+            st = _statement_stats[q] = {
+                "calls": 0, "translate_hits": 0, "translate_misses": 0,
+                "prepares": 0, "prepared_executes": 0, "prepare_failures": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "errors": 0,
+            }
+            while len(_statement_stats) > PG_STATS_SIZE:
+                _statement_stats.popitem(last=False)
+        else:
+            _statement_stats.move_to_end(q)
+        for k, v in counts.items():
+            st[k] += v
+        return st["calls"]
+
+# ---------------- INSTRUMENTATION ----------------
+_query_hooks = []
+
+def add_query_hook(fn):
+    """
+    Register fn(event), called after every statement and pooled connection checkout.
+    event is a dict: {"kind": "query", "sql", "ms", "rows", "error"} or {"kind": "acquire", "ms"}.
+    Hooks run on the calling thread; exceptions raised by a hook are swallowed.
+    """
+    _query_hooks.append(fn)
+    return fn
+
+def _emit(event):
+    for fn in _query_hooks:
+        try:
+            fn(event)
+        except Exception as e:
+            print("Query hook error:", e)
+
+def _observe(q, start, cur, error=None):
+    """Record timing/row count for one executed statement, log it if slow, notify hooks."""
+    ms = (time.perf_counter() - start) * 1000
+    rows = cur.rowcount if error is None and cur.rowcount > 0 else 0
+    with _stats_lock:
+        st = _statement_stats.get(q)
+        if st is not None:
+            st["total_ms"] += ms
+            st["max_ms"] = max(st["max_ms"], ms)
+            st["rows"] += rows
+            st["errors"] += int(error is not None)
+    if PG_SLOW_QUERY_MS and ms >= PG_SLOW_QUERY_MS:
+        print(f"🐢 Slow query ({ms:.1f} ms, {rows} rows): {' '.join(q.split())[:500]}")
+    if _query_hooks:
+        _emit({"kind": "query", "sql": q, "ms": ms, "rows": rows, "error": error})
+
+def _to_server_placeholders(q):
+    """Rewrite psycopg2 %s placeholders as $1, $2 ... for PREPARE."""
+    n = 0
+    out = []
+    i = 0
+    while i < len(q):
+        if q.startswith("%s", i):
+            n += 1
+            out.append("$%d" % n)
+            i += 2
+        elif q.startswith("%%", i):
+            out.append("%")
+            i += 2
+        else:
+            out.append(q[i])
+            i += 1
+    return "".join(out), n
+
+def _run(conn, cur, query, params=None):
+    """
+    Execute `query` on `cur`, translating it through the statement cache and,
+    when PG_PREPARE is on, through a per-connection prepared statement once the
+    statement has been seen PG_PREPARE_THRESHOLD times. Timed by _observe().
+    """
+    q, hit = _sql_cache.get(query)
+    calls = _bump(q, calls=1, translate_hits=int(hit), translate_misses=int(not hit))
+    start = time.perf_counter()
+    try:
+        _execute(conn, cur, q, params, calls)
+    except Exception as e:
+        _observe(q, start, cur, e)
+        raise
+    _observe(q, start, cur)
+
+def _prepare(cur, q, params, names):
+    """
+    PREPARE `q` on this connection; returns the statement name, or None when
+    the placeholders don't match the parameters or the server rejects it
+    (e.g. "could not determine data type of parameter $1"). The attempt runs
+    under a savepoint, so a rejection leaves the caller's transaction usable;
+    a rejected statement is never offered for PREPARE again.
+    """
+    server_q, nparams = _to_server_placeholders(q)
+    if nparams != len(params or ()):
+        return None
+    name = "s%d_%s" % (next(_prepare_seq), hashlib.md5(q.encode("utf-8")).hexdigest()[:12])
+    cur.execute("SAVEPOINT db_prepare")
+    try:
+        cur.execute("PREPARE %s AS %s" % (name, server_q))
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT db_prepare")
+        with _stats_lock:
+            _unpreparable[q] = True
+            while len(_unpreparable) > PG_SQL_CACHE_SIZE:
+                _unpreparable.popitem(last=False)
+        _bump(q, prepare_failures=1)
+        return None
+    cur.execute("RELEASE SAVEPOINT db_prepare")
+    names[q] = name
+    _bump(q, prepares=1)
+    return name
+
+def _execute(conn, cur, q, params, calls):
+    if (PG_PREPARE and not isinstance(params, dict) and q not in _unpreparable
+            and q.lstrip().upper().startswith(_PREPARABLE)):
+        names = _prepared.setdefault(conn, {})
+        name = names.get(q)
+        if name is None and calls >= PG_PREPARE_THRESHOLD:
+            name = _prepare(cur, q, params, names)
+        try:
+            if name is not None:
+                if params:
+                    cur.execute("EXECUTE %s (%s)" % (name, ", ".join(["%s"] * len(params))), params)
+                else:
+                    cur.execute("EXECUTE %s" % name)
+                _bump(q, prepared_executes=1)
+                return
+        except Exception:
+            # the statement may not exist on the server any more; re-PREPARE under a fresh name next time
+            names.pop(q, None)
+            raise
+
+    if params:
+        cur.execute(q, params)
+    else:
+        cur.execute(q)
+
+def statement_stats():
+    """
+    Per-statement counters: calls, translation cache hits/misses, prepares,
+    prepare failures, prepared executes, total/max execution ms, rows affected or returned, errors.
+    """
+    with _stats_lock:
+        return {q: dict(st) for q, st in _statement_stats.items()}
+
+def sql_cache_info():
+    return {"size": len(_sql_cache), "maxsize": _sql_cache.maxsize, "prepare": PG_PREPARE}
+
 def get_conn():
     return psycopg2.connect(
         host=PG_HOST,
@@ -41,41 +254,359 @@ def get_conn():
         password=PG_PASS
     )
 
+# ---------------- CONNECTION POOL ----------------
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout."""
+
+class ConnectionPool:
+    """
+    Small thread-safe pool of psycopg2 connections.
+    - keeps between `minconn` and `maxconn` connections open
+    - callers block up to `timeout` seconds when every connection is checked out
+    - connections idle longer than `healthcheck_idle` seconds are pinged before reuse
+    - broken connections are discarded and transparently replaced
+    """
+
+    def __init__(self, minconn=PG_POOL_MIN, maxconn=PG_POOL_MAX, timeout=PG_POOL_TIMEOUT,
+                 healthcheck_idle=PG_POOL_HEALTHCHECK_IDLE, connect=get_conn):
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size: min=%s max=%s" % (minconn, maxconn))
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, last_used_monotonic)]
+        self._size = 0           # open connections, idle + in use
+        self._in_use = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "discards": 0,
+            "healthcheck_failures": 0,
+            "checkout_ms_total": 0.0,
+            "checkout_ms_max": 0.0,
+        }
+        for _ in range(minconn):
+            conn = self._connect()
+            self._stats["connects"] += 1
+            self._size += 1
+            self._idle.append((conn, time.monotonic()))
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    # reserve a slot; the connection is opened outside the lock
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout("no database connection free after %.1fs" % self.timeout)
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                with self._cond:
+                    self._stats["healthcheck_failures"] += 1
+                    self._stats["discards"] += 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+            if conn is None:
+                conn = self._connect()
+                with self._cond:
+                    self._stats["connects"] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["checkout_ms_total"] += elapsed_ms
+            self._stats["checkout_ms_max"] = max(self._stats["checkout_ms_max"], elapsed_ms)
+        if _query_hooks:
+            _emit({"kind": "acquire", "ms": elapsed_ms})
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            # never hand out a connection with an open or failed transaction
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or conn.closed:
+                self._size -= 1
+                self._stats["discards"] += 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._size -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats)
+            s.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "max": self.maxconn,
+            })
+        s["checkout_ms_avg"] = s["checkout_ms_total"] / s["checkouts"] if s["checkouts"] else 0.0
+        return s
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide pool, created on first use (so forked workers each get their own)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+def pool_stats():
+    """Snapshot of pool counters: size, idle, in_use, waits, timeouts, checkout latency."""
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
 def execute_query(query, params=None, fetch=False, returning=False):
     """
-    Execute a SQL query with params.
+    Execute a SQL query with params on a pooled connection.
     - query: may contain Oracle-style placeholders (:1, :2); they will be converted.
     - params: tuple/list of parameters in same order as placeholders.
     - fetch: if True, returns a list of tuples from cursor.fetchall()
     - returning: if True, expects an INSERT ... RETURNING id and returns cursor.fetchone()[0]
     """
-    q = _translate_oracle_sql(query)
-    conn = None
-    try:
-        conn = get_conn()
-        cur = conn.cursor()
-        if params:
-            cur.execute(q, params)
-        else:
-            cur.execute(q)
+    with get_pool().connection() as conn:
+        try:
+            cur = conn.cursor()
+            _run(conn, cur, query, params)
+
+            if returning:
+                row = cur.fetchone()
+                conn.commit()
+                cur.close()
+                return row[0] if row else None
 
-        if returning:
-            row = cur.fetchone()
+            data = None
+            if fetch:
+                data = cur.fetchall()
             conn.commit()
             cur.close()
-            return row[0] if row else None
-
-        data = None
-        if fetch:
-            data = cur.fetchall()
-        conn.commit()
-        cur.close()
-        return data
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        print("DB error:", e)
-        raise
-    finally:
-        if conn:
+            return data
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            print("DB error:", e)
+            raise
+
+class _TrackedCursor(extensions.cursor):
+    """Cursor handed out by transaction(); counts and times its statements in statement_stats()."""
+
+    def execute(self, query, vars=None):
+        q = _stat_key(query)
+        _bump(q, calls=1)
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception as e:
+            _observe(q, start, self, e)
+            raise
+        _observe(q, start, self)
+        return result
+
+def _stat_key(query):
+    # execute_values sends one expanded statement per page; count those under their prefix
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+        head, sep, _ = query.partition(" VALUES ")
+        return head + sep + "..." if sep else query
+    return query
+
+@contextmanager
+def transaction(snapshot=False):
+    """
+    Run several statements on one pooled connection and commit them together.
+    Yields a plain psycopg2 cursor (use %s placeholders); rolls back on error.
+    snapshot=True runs a READ ONLY, REPEATABLE READ transaction so every
+    statement sees the same snapshot of the database.
+    """
+    with get_pool().connection() as conn:
+        cur = conn.cursor(cursor_factory=_TrackedCursor)
+        try:
+            if snapshot:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            yield cur
+            conn.commit()
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            print("DB error:", e)
+            raise
+        finally:
+            cur.close()
+
+_named_seq = itertools.count(1)
+_stream_slots = threading.BoundedSemaphore(PG_STREAM_MAX)
+
+@contextmanager
+def _dedicated_connection():
+    """
+    A connection of its own, outside the pool, for reads paced by a client
+    (report downloads). At most PG_STREAM_MAX are open at once; waiting
+    longer than PG_POOL_TIMEOUT for a slot raises PoolTimeout.
+    """
+    if not _stream_slots.acquire(timeout=PG_POOL_TIMEOUT):
+        raise PoolTimeout("no streaming connection free after %.1fs" % PG_POOL_TIMEOUT)
+    try:
+        conn = get_conn()
+        try:
+            yield conn
+        finally:
             conn.close()
+    finally:
+        _stream_slots.release()
+
+@contextmanager
+def named_cursor(itersize=PG_ITERSIZE, dedicated=False):
+    """
+    Server-side (named) cursor in a READ ONLY transaction.
+    Iterating it pulls `itersize` rows per round trip, so memory stays flat no
+    matter how many rows the query returns. The connection is held until the
+    block exits: a pooled one by default (keep the block to the read itself),
+    or with dedicated=True one outside the pool, for streams whose pace is
+    set by a slow consumer such as a download.
+    """
+    source = _dedicated_connection() if dedicated else get_pool().connection()
+    with source as conn:
+        with conn.cursor() as c:
+            c.execute("SET TRANSACTION READ ONLY")
+        cur = conn.cursor(name="stream_%d" % next(_named_seq), cursor_factory=_TrackedCursor)
+        cur.itersize = itersize
+        try:
+            yield cur
+        finally:
+            try:
+                cur.close()
+                conn.rollback()
+            except Exception:
+                pass
+
+def iter_query(query, params=None, itersize=PG_ITERSIZE, batch_size=None, dedicated=False):
+    """
+    Stream the rows of a SELECT from a server-side cursor instead of fetchall().
+    - batch_size=None: yields row tuples
+    - batch_size=N: yields lists of up to N rows (ready for np.array(batch))
+    Peak memory is bounded by itersize / batch_size, not by the result size.
+    The connection (pooled, or dedicated -- see named_cursor) is held until
+    the generator is exhausted or closed.
+    """
+    q, _ = _sql_cache.get(query)
+    with named_cursor(itersize, dedicated=dedicated) as cur:
+        cur.execute(q, params or None)
+        if batch_size is None:
+            yield from cur
+            return
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            yield batch
+
+_ensured = set()
+_ensure_lock = threading.Lock()
+
+def ensure_schema(name, ddl):
+    """Run idempotent DDL (CREATE ... IF NOT EXISTS) once per process under `name`."""
+    if name in _ensured:
+        return
+    with _ensure_lock:
+        if name in _ensured:
+            return
+        execute_query(ddl)
+        _ensured.add(name)
+
+class SchemaMissing(Exception):
+    """Raised when a table that migrations.py creates is not there yet."""
+
+def require_relation(name):
+    """
+    Cheap runtime guard for migrated tables: one to_regclass() lookup per
+    process, no DDL. Raises SchemaMissing until `python migrations.py upgrade` ran.
+    """
+    key = "relation:" + name.lower()
+    if key in _ensured:
+        return
+    row = execute_query("SELECT to_regclass(%s) IS NOT NULL", (name.lower(),), fetch=True)
+    if not row or not row[0][0]:
+        raise SchemaMissing(f"{name} does not exist; run `python migrations.py upgrade`")
+    with _ensure_lock:
+        _ensured.add(key)
@@ -0,0 +1,282 @@
+# email_queue.py (durable outbound email queue + SMTP worker pool)
+#
+# send_email() in models.py only INSERTs into EmailOutbox; EmailDispatcher
+# threads claim due rows with FOR UPDATE SKIP LOCKED and deliver them over
+# long-lived SMTP sessions, retrying failures with exponential backoff.
+# Rows survive restarts: anything left in 'sending' by a dead worker is
+# picked up again after EMAIL_STUCK_AFTER seconds.
+#
+# Local testing without Gmail:
+#   python -m aiosmtpd -n -l localhost:8025
+#   SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 EMAIL_ADDR=portal@example.com python email_worker.py --drain
+# test_email_queue.py does the same against an in-process aiosmtpd server.
+import os
+import time
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+
+from db import execute_query, transaction, ensure_schema
+
+load_dotenv()
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", 2))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETRY_BASE = float(os.getenv("EMAIL_RETRY_BASE", 30))        # seconds, doubled per failed attempt
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 2))   # idle workers re-check the queue this often
+EMAIL_SESSION_IDLE = float(os.getenv("EMAIL_SESSION_IDLE", 60))    # drop SMTP sessions idle longer than this
+EMAIL_STUCK_AFTER = int(os.getenv("EMAIL_STUCK_AFTER", 600))       # reclaim 'sending' rows older than this
+
+OUTBOX_DDL = """
+CREATE TABLE IF NOT EXISTS EmailOutbox (
+    id              BIGSERIAL PRIMARY KEY,
+    to_address      TEXT NOT NULL,
+    subject         TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    status          VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    locked_at       TIMESTAMP,
+    last_error      TEXT,
+    created_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    sent_at         TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS emailoutbox_due_idx ON EmailOutbox (next_attempt_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS emailoutbox_sending_idx ON EmailOutbox (locked_at) WHERE status = 'sending';
+"""
+
+def _ensure_outbox():
+    ensure_schema("email_outbox", OUTBOX_DDL)
+
+def _sender():
+    return os.getenv("EMAIL_ADDR"), os.getenv("EMAIL_APP_PASSWORD")
+
+def _dev_mode():
+    # no sender, or Gmail without an app password: print instead of sending
+    sender, app_password = _sender()
+    return not sender or (not app_password and not os.getenv("SMTP_HOST"))
+
+def _build_message(sender, to_address, subject, body):
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = to_address
+    return msg
+
+# ---------------- QUEUE ----------------
+def enqueue_email(to_address, subject, body):
+    _ensure_outbox()
+    return execute_query(
+        "INSERT INTO EmailOutbox (to_address, subject, body) VALUES (%s, %s, %s) RETURNING id",
+        (to_address, subject, body), returning=True
+    )
+
+def enqueue_emails(messages, cur=None):
+    """Queue many (to_address, subject, body) tuples with one multi-row INSERT."""
+    messages = [m for m in messages if m[0]]
+    if not messages:
+        return 0
+    _ensure_outbox()
+    q = "INSERT INTO EmailOutbox (to_address, subject, body) VALUES %s"
+    if cur is not None:
+        execute_values(cur, q, messages, page_size=1000)
+    else:
+        with transaction() as cur:
+            execute_values(cur, q, messages, page_size=1000)
+    return len(messages)
+
+def _claim_batch(limit, ids=None):
+    """Claim up to `limit` due rows; `ids` restricts the claim to those outbox rows."""
+    id_filter = "AND id = ANY(%s)" if ids is not None else ""
+    params = (EMAIL_STUCK_AFTER,) + ((list(ids),) if ids is not None else ()) + (limit,)
+    with transaction() as cur:
+        cur.execute(f"""
+            UPDATE EmailOutbox
+            SET status = 'sending', locked_at = NOW(), attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM EmailOutbox
+                WHERE ((status = 'pending' AND next_attempt_at <= NOW())
+                    OR (status = 'sending' AND locked_at < NOW() - %s * INTERVAL '1 second'))
+                  {id_filter}
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, to_address, subject, body, attempts
+        """, params)
+        return cur.fetchall()
+
+def _mark_sent(ids):
+    if ids:
+        execute_query(
+            "UPDATE EmailOutbox SET status = 'sent', sent_at = NOW(), locked_at = NULL, last_error = NULL "
+            "WHERE id = ANY(%s)", (list(ids),)
+        )
+
+def _mark_failed(failures):
+    """failures: [(id, attempts, error)]; retried with backoff until EMAIL_MAX_ATTEMPTS."""
+    for msg_id, attempts, error in failures:
+        if attempts >= EMAIL_MAX_ATTEMPTS:
+            execute_query(
+                "UPDATE EmailOutbox SET status = 'failed', locked_at = NULL, last_error = %s WHERE id = %s",
+                (str(error)[:1000], msg_id)
+            )
+        else:
+            delay = EMAIL_RETRY_BASE * (2 ** (attempts - 1))
+            execute_query(
+                "UPDATE EmailOutbox SET status = 'pending', locked_at = NULL, last_error = %s, "
+                "next_attempt_at = NOW() + %s * INTERVAL '1 second' WHERE id = %s",
+                (str(error)[:1000], delay, msg_id)
+            )
+
+def outbox_stats():
+    _ensure_outbox()
+    rows = execute_query("SELECT status, COUNT(*) FROM EmailOutbox GROUP BY status", fetch=True)
+    return {status: cnt for status, cnt in rows or []}
+
+# ---------------- SMTP SESSION ----------------
+class _SMTPSession:
+    """One authenticated SMTP connection, reopened when it drops or sits idle too long."""
+
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def _open(self):
+        sender, app_password = _sender()
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            server.starttls()
+        if app_password:
+            server.login(sender, app_password)
+        self._server = server
+
+    def send(self, to_address, subject, body):
+        sender, _ = _sender()
+        if self._server is not None and time.monotonic() - self._last_used > EMAIL_SESSION_IDLE:
+            self.close()
+        if self._server is None:
+            self._open()
+        try:
+            self._server.send_message(_build_message(sender, to_address, subject, body))
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self.close()
+            raise
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+def send_email_now(to_address, subject, body):
+    """Deliver one message inline, bypassing the queue."""
+    if _dev_mode():
+        print(f"📧 [DEV MODE] send_email to {to_address} | Subject: {subject} | Body: {body}")
+        return
+    session = _SMTPSession()
+    try:
+        session.send(to_address, subject, body)
+        print(f"✅ Email sent to: {to_address}")
+    except Exception as e:
+        print(f"❌ Email send error: {e}")
+    finally:
+        session.close()
+
+# ---------------- DISPATCHER ----------------
+class EmailDispatcher:
+    """Pool of worker threads draining EmailOutbox, each with its own SMTP session."""
+
+    def __init__(self, workers=EMAIL_WORKERS, batch_size=EMAIL_BATCH_SIZE, poll_interval=EMAIL_POLL_INTERVAL):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _send_batch(self, session, batch):
+        sent, failures = [], []
+        for msg_id, to_address, subject, body, attempts in batch:
+            if _dev_mode():
+                print(f"📧 [DEV MODE] send_email to {to_address} | Subject: {subject} | Body: {body}")
+                sent.append(msg_id)
+                continue
+            try:
+                session.send(to_address, subject, body)
+                sent.append(msg_id)
+            except Exception as e:
+                print(f"❌ Email send error ({to_address}): {e}")
+                failures.append((msg_id, attempts, e))
+        _mark_sent(sent)
+        _mark_failed(failures)
+        return len(sent), len(failures)
+
+    def run_once(self, session=None, ids=None):
+        """
+        Claim and send one batch. Returns (sent, failed), (0, 0) when nothing is due.
+        `ids` limits the batch to those outbox rows and leaves the rest of the queue alone.
+        """
+        _ensure_outbox()
+        batch = _claim_batch(self.batch_size, ids)
+        if not batch:
+            return 0, 0
+        own_session = session is None
+        session = session or _SMTPSession()
+        try:
+            return self._send_batch(session, batch)
+        finally:
+            if own_session:
+                session.close()
+
+    def drain(self):
+        """Send everything currently due from the calling thread; returns (sent, failed)."""
+        session = _SMTPSession()
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = self.run_once(session)
+                if not sent and not failed:
+                    break
+                total_sent += sent
+                total_failed += failed
+        finally:
+            session.close()
+        return total_sent, total_failed
+
+    def _worker(self):
+        session = _SMTPSession()
+        try:
+            while not self._stop.is_set():
+                try:
+                    sent, failed = self.run_once(session)
+                except Exception as e:
+                    print("Email worker error:", e)
+                    sent = failed = 0
+                if not sent and not failed:
+                    self._stop.wait(self.poll_interval)
+        finally:
+            session.close()
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"email-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
@@ -0,0 +1,23 @@
+import sys
+import time
+from email_queue import EmailDispatcher, outbox_stats, EMAIL_WORKERS
+
+# Standalone email dispatcher.
+#   python email_worker.py           run worker threads until Ctrl+C
+#   python email_worker.py --drain   send everything currently due, then exit
+# Run this next to the web app in production (importing app.py starts no
+# dispatcher); for `python app.py` set EMAIL_WORKERS=0 if this runs too.
+
+if "--drain" in sys.argv:
+    sent, failed = EmailDispatcher().drain()
+    print(f"✅ Drained outbox: {sent} sent, {failed} failed. Queue: {outbox_stats()}")
+else:
+    dispatcher = EmailDispatcher(workers=max(1, EMAIL_WORKERS)).start()
+    print("📬 Email worker running. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(60)
+            print("📊 Outbox:", outbox_stats())
+    except KeyboardInterrupt:
+        dispatcher.stop()
+        print("👋 Email worker stopped.")
@@ -1,6 +1,7 @@
 import random
 from datetime import datetime, timedelta
 from db import execute_query
+from models import AttendanceRollup
 
 NUM_SUBJECTS = 6
 
@@ -37,11 +38,15 @@ def generate_attendance():
             for cid in course_ids:
                 present = 1 if random.random() < 0.85 else 0
 
+                # re-runs overwrite the day, as mark_attendance_bulk does (unique index, migration 3)
                 execute_query(
                     "INSERT INTO Attendance (student_id, course_id, date_marked, present, created_at) "
-                    "VALUES (%s,%s,%s,%s,NOW())",
+                    "VALUES (%s,%s,%s,%s,NOW()) "
+                    "ON CONFLICT (student_id, course_id, date_marked) DO UPDATE "
+                    "SET present = EXCLUDED.present, created_at = NOW()",
                     (sid, cid, date_val, present)
                 )
+    AttendanceRollup.rebuild()
     print("✔ Attendance inserted for last 90 days.")
 
 
@@ -0,0 +1,29 @@
+# export_report.py (write a report from exports.py to a file, streaming)
+#
+#   python export_report.py school_grades -o grades.csv
+#   python export_report.py attendance_register --id 3 --gzip -o course3_attendance.csv.gz
+#   python export_report.py school_attendance --gzip        # -> school_attendance.csv.gz
+import time
+import argparse
+
+from exports import REPORTS, stream_report, report_filename
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a CSV report without loading it into memory.")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("--id", type=int, help="student id / course id for per-student and per-course reports")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    if ("%s" in REPORTS[args.report][1]) != (args.id is not None):
+        parser.error(f"{args.report} {'needs' if args.id is None else 'does not take'} --id")
+
+    path = args.output or report_filename(args.report, args.id, args.gzip)
+    start = time.time()
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in stream_report(args.report, args.id, gzip=args.gzip):
+            f.write(chunk)
+            written += len(chunk)
+    print(f"📁 Wrote {path} ({written / 1024:.1f} KB) in {time.time() - start:.2f}s")
@@ -0,0 +1,110 @@
+# exports.py (streaming CSV / gzip report exports)
+#
+# Each report is one SELECT read through a server-side cursor (db.iter_query)
+# and written out as CSV a chunk at a time, optionally gzip-compressed on the
+# fly, so memory stays flat whether a report has ten rows or ten million.
+# app.py streams these straight to the browser; export_report.py writes them
+# to a file. A download runs at the client's pace, so the cursor sits on a
+# dedicated connection (at most db.PG_STREAM_MAX at once), never on one the
+# request pool needs.
+import io
+import csv
+import zlib
+
+from db import iter_query
+
+CHUNK_ROWS = 1000       # rows buffered before a chunk is yielded
+
+# name -> (header, sql); every query takes exactly one parameter (student or course id) or none
+REPORTS = {
+    "student_grades": (
+        ["course_id", "course", "marks"],
+        """
+        SELECT c.id, c.course_name, COALESCE(sc.marks, 0)
+        FROM StudentCourses sc
+        JOIN Courses c ON c.id = sc.course_id
+        WHERE sc.student_id = %s
+        ORDER BY c.course_name
+        """,
+    ),
+    "course_gradebook": (
+        ["student_id", "student", "course_marks", "assignments_submitted", "assignments_graded", "avg_assignment_marks"],
+        """
+        SELECT s.id, s.name, sc.marks,
+               COUNT(sub.id), COUNT(sub.marks), ROUND(AVG(sub.marks)::numeric, 2)
+        FROM StudentCourses sc
+        JOIN Students s ON s.id = sc.student_id
+        LEFT JOIN Assignments a ON a.course_id = sc.course_id
+        LEFT JOIN Submissions sub ON sub.assignment_id = a.id AND sub.student_id = sc.student_id
+        WHERE sc.course_id = %s
+        GROUP BY s.id, s.name, sc.marks
+        ORDER BY s.name, s.id
+        """,
+    ),
+    "attendance_register": (
+        ["date", "student_id", "student", "present"],
+        """
+        SELECT a.date_marked::date, s.id, s.name, a.present
+        FROM Attendance a
+        JOIN Students s ON s.id = a.student_id
+        WHERE a.course_id = %s
+        ORDER BY a.date_marked, s.name, s.id
+        """,
+    ),
+    "school_grades": (
+        ["student_id", "student", "course_id", "course", "marks"],
+        """
+        SELECT s.id, s.name, c.id, c.course_name, sc.marks
+        FROM StudentCourses sc
+        JOIN Students s ON s.id = sc.student_id
+        JOIN Courses c ON c.id = sc.course_id
+        ORDER BY s.id, c.id
+        """,
+    ),
+    "school_attendance": (
+        ["date", "student_id", "course_id", "present"],
+        """
+        SELECT date_marked::date, student_id, course_id, present
+        FROM Attendance
+        ORDER BY date_marked, course_id, student_id
+        """,
+    ),
+}
+
+def _csv_chunks(header, rows):
+    """Encode rows as CSV text, CHUNK_ROWS at a time."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    n = 0
+    for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n % CHUNK_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+def _gzip_chunks(chunks):
+    # wbits=31: gzip container, so the output is a valid .csv.gz file
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = z.compress(chunk)
+        if data:
+            yield data
+    yield z.flush()
+
+def stream_report(name, param=None, gzip=False):
+    """
+    Generator of bytes for report `name`. The server-side cursor (and its
+    dedicated connection) is held only while the generator is being consumed
+    and is released when it finishes or is closed.
+    """
+    header, sql = REPORTS[name]
+    chunks = _csv_chunks(header, iter_query(sql, (param,) if "%s" in sql else None, dedicated=True))
+    yield from (_gzip_chunks(chunks) if gzip else chunks)
+
+def report_filename(name, param=None, gzip=False):
+    return f"{name}{'_' + str(param) if param is not None else ''}.csv{'.gz' if gzip else ''}"
@@ -2,6 +2,7 @@
 import random
 from datetime import datetime, timedelta
 from db import execute_query
+from models import AttendanceRollup
 
 student_ids = [1,2,3,4,5]  # real ones
 course_ids = [1,2,3,4,5,6]
@@ -23,8 +24,12 @@ for sid in student_ids:
                 present = 1 if random.random() < 0.2 else 0
             else:
                 present = 1 if random.random() < 0.85 else 0
+            # re-runs overwrite the day, as mark_attendance_bulk does (unique index, migration 3)
             execute_query(
-                "INSERT INTO Attendance (student_id, course_id, date_marked, present, created_at) VALUES (%s,%s,%s,%s,NOW())",
+                "INSERT INTO Attendance (student_id, course_id, date_marked, present, created_at) VALUES (%s,%s,%s,%s,NOW()) "
+                "ON CONFLICT (student_id, course_id, date_marked) DO UPDATE "
+                "SET present = EXCLUDED.present, created_at = NOW()",
                 (sid, cid, date_val, present)
             )
+AttendanceRollup.rebuild(student_ids)
 print("Inserted attendance for students", student_ids)
@@ -0,0 +1,160 @@
+# metrics.py (per-route DB accounting + Prometheus text exposition)
+#
+# db.py calls a hook after every statement and connection checkout; while a
+# Flask request is active those are summed on flask.g, and finish_request()
+# folds the totals into per-endpoint counters. render() formats those, the
+# per-statement stats and the pool stats in the Prometheus text format
+# (no client library needed), served by app.py at /metrics.
+import time
+import hashlib
+import threading
+from flask import g, has_request_context
+
+from db import add_query_hook, statement_stats, pool_stats
+
+# per-request DB query counts are bucketed so "which page fires 40 queries" is one query away
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 40, 80)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_lock = threading.Lock()
+_routes = {}    # (endpoint, method) -> counters
+
+def _on_db_event(event):
+    if not has_request_context() or "db_queries" not in g:
+        return
+    if event["kind"] == "query":
+        g.db_queries += 1
+        g.db_ms += event["ms"]
+        g.db_rows += event["rows"]
+    else:
+        g.db_acquire_ms += event["ms"]
+
+add_query_hook(_on_db_event)
+
+def start_request():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_ms = 0.0
+    g.db_rows = 0
+    g.db_acquire_ms = 0.0
+
+def finish_request(endpoint, method, status):
+    """Fold the current request's totals into the per-route counters; returns them."""
+    if "db_queries" not in g:
+        return None
+    totals = {
+        "ms": (time.perf_counter() - g.request_started) * 1000,
+        "db_queries": g.db_queries,
+        "db_ms": g.db_ms,
+        "db_rows": g.db_rows,
+        "db_acquire_ms": g.db_acquire_ms,
+    }
+    key = (endpoint or "unmatched", method)
+    with _lock:
+        r = _routes.get(key)
+        if r is None:
+            r = _routes[key] = {
+                "requests": 0, "errors": 0, "ms": 0.0, "db_queries": 0, "db_ms": 0.0,
+                "db_rows": 0, "db_acquire_ms": 0.0, "db_queries_max": 0,
+                "query_buckets": [0] * len(QUERY_COUNT_BUCKETS),
+                "latency_buckets": [0] * len(LATENCY_BUCKETS_MS),
+            }
+        r["requests"] += 1
+        r["errors"] += int(status >= 500)
+        for k in ("ms", "db_queries", "db_ms", "db_rows", "db_acquire_ms"):
+            r[k] += totals[k]
+        r["db_queries_max"] = max(r["db_queries_max"], totals["db_queries"])
+        for i, bound in enumerate(QUERY_COUNT_BUCKETS):
+            if totals["db_queries"] <= bound:
+                r["query_buckets"][i] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if totals["ms"] <= bound:
+                r["latency_buckets"][i] += 1
+    return totals
+
+def route_stats():
+    with _lock:
+        return {key: dict(r, query_buckets=list(r["query_buckets"]),
+                          latency_buckets=list(r["latency_buckets"]))
+                for key, r in _routes.items()}
+
+# ---------------- PROMETHEUS TEXT FORMAT ----------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def _statement_label(sql):
+    """Stable short id plus a single-line preview of the SQL."""
+    text = " ".join(sql.split())
+    return hashlib.md5(text.encode("utf-8")).hexdigest()[:12], text[:160]
+
+def render():
+    out = []
+
+    def metric(name, kind, help_text, samples):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            out.append(f"{name}{labels} {value}")
+
+    routes = route_stats()
+    metric("app_http_requests_total", "counter", "Requests handled, by endpoint and method.",
+           [(_labels(endpoint=e, method=m), r["requests"]) for (e, m), r in routes.items()])
+    metric("app_http_request_errors_total", "counter", "Requests that ended in a 5xx response.",
+           [(_labels(endpoint=e, method=m), r["errors"]) for (e, m), r in routes.items()])
+
+    def histogram(name, help_text, buckets, bucket_key, sum_key):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} histogram")
+        for (e, m), r in routes.items():
+            for bound, count in zip(buckets, r[bucket_key]):
+                out.append(f"{name}_bucket{_labels(endpoint=e, method=m, le=bound)} {count}")
+            out.append(f"{name}_bucket{_labels(endpoint=e, method=m, le='+Inf')} {r['requests']}")
+            out.append(f"{name}_sum{_labels(endpoint=e, method=m)} {r[sum_key]}")
+            out.append(f"{name}_count{_labels(endpoint=e, method=m)} {r['requests']}")
+
+    histogram("app_http_request_duration_ms", "Request latency in milliseconds.",
+              LATENCY_BUCKETS_MS, "latency_buckets", "ms")
+    histogram("app_db_queries_per_request", "Database statements executed per request.",
+              QUERY_COUNT_BUCKETS, "query_buckets", "db_queries")
+    metric("app_db_queries_per_request_max", "gauge", "Most statements seen in a single request.",
+           [(_labels(endpoint=e, method=m), r["db_queries_max"]) for (e, m), r in routes.items()])
+    metric("app_db_time_ms_total", "counter", "Time spent executing statements during requests.",
+           [(_labels(endpoint=e, method=m), round(r["db_ms"], 3)) for (e, m), r in routes.items()])
+    metric("app_db_acquire_ms_total", "counter", "Time spent waiting for pooled connections during requests.",
+           [(_labels(endpoint=e, method=m), round(r["db_acquire_ms"], 3)) for (e, m), r in routes.items()])
+    metric("app_db_rows_total", "counter", "Rows returned or affected during requests.",
+           [(_labels(endpoint=e, method=m), r["db_rows"]) for (e, m), r in routes.items()])
+
+    # statements that differ only in whitespace share a label set, so merge them first
+    stmts = {}
+    for sql, st in statement_stats().items():
+        label = _statement_label(sql)
+        if label in stmts:
+            merged = stmts[label]
+            for k, v in st.items():
+                merged[k] = max(merged[k], v) if k == "max_ms" else merged[k] + v
+        else:
+            stmts[label] = st
+    for name, key, kind, help_text in (
+        ("db_statement_calls_total", "calls", "counter", "Executions per statement."),
+        ("db_statement_time_ms_total", "total_ms", "counter", "Execution time per statement."),
+        ("db_statement_time_ms_max", "max_ms", "gauge", "Slowest single execution per statement."),
+        ("db_statement_rows_total", "rows", "counter", "Rows returned or affected per statement."),
+        ("db_statement_errors_total", "errors", "counter", "Failed executions per statement."),
+    ):
+        metric(name, kind, help_text,
+               [(_labels(id=sid, sql=preview), round(st[key], 3)) for (sid, preview), st in stmts.items()])
+
+    pool = pool_stats()
+    if pool:
+        for key, kind in (("size", "gauge"), ("idle", "gauge"), ("in_use", "gauge"), ("max", "gauge"),
+                          ("checkouts", "counter"), ("waits", "counter"), ("timeouts", "counter"),
+                          ("connects", "counter"), ("discards", "counter"),
+                          ("checkout_ms_total", "counter"), ("checkout_ms_max", "gauge")):
+            name = f"db_pool_{key}" + ("_total" if kind == "counter" and not key.endswith("_total") else "")
+            metric(name, kind, f"Connection pool {key.replace('_', ' ')}.", [("", round(pool[key], 3))])
+
+    return "\n".join(out) + "\n"
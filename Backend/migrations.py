@@ -0,0 +1,333 @@
+# migrations.py (versioned schema + hot-path indexes)
+#
+#   python migrations.py upgrade   apply pending migrations (default)
+#   python migrations.py status    list applied / pending versions
+#   python migrations.py check     EXPLAIN the hot queries; exit 1 if any falls back to a Seq Scan
+#
+# Every migration is idempotent (IF NOT EXISTS), so it is safe on databases
+# that were created by hand before this file existed. The runtime
+# ensure_schema() calls in models.py / email_queue.py reuse some of the same
+# DDL and are a no-op once the database is migrated; anything that locks,
+# rewrites or backfills a large table is defined here and runs only here.
+import sys
+import json
+from datetime import date
+
+from db import execute_query, transaction
+from models import (AttendanceModel, AttendanceRollup, Notification, OTP, Submission, TeacherDashboard,
+                    NOTIFICATION_FEED_DDL, TEACHER_COURSES_SQL, TEACHER_POSTS_SQL, UNREAD_COUNT_SQL,
+                    feed_page_sql)
+from ml_model import (RISK_SNAPSHOT_DDL, CHANGED_STUDENTS_SQL, PREVIOUS_NOTIFIED_SQL, feature_matrix_query)
+from email_queue import OUTBOX_DDL
+
+CORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Students (
+    id           SERIAL PRIMARY KEY,
+    name         VARCHAR(100) NOT NULL,
+    email        VARCHAR(255),
+    phone        VARCHAR(20),
+    password     VARCHAR(255) NOT NULL,
+    grades       VARCHAR(50),
+    parent_email VARCHAR(255)
+);
+CREATE TABLE IF NOT EXISTS Courses (
+    id          SERIAL PRIMARY KEY,
+    course_name VARCHAR(100) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS StudentCourses (
+    id         SERIAL PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES Students(id),
+    course_id  INTEGER NOT NULL REFERENCES Courses(id),
+    marks      NUMERIC(5, 2)
+);
+CREATE TABLE IF NOT EXISTS Teachers (
+    id       SERIAL PRIMARY KEY,
+    name     VARCHAR(100) NOT NULL,
+    password VARCHAR(255) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS TeacherCourses (
+    id         SERIAL PRIMARY KEY,
+    teacher_id INTEGER NOT NULL REFERENCES Teachers(id),
+    course_id  INTEGER NOT NULL REFERENCES Courses(id)
+);
+CREATE TABLE IF NOT EXISTS TeacherPosts (
+    id         SERIAL PRIMARY KEY,
+    teacher_id INTEGER NOT NULL REFERENCES Teachers(id),
+    message    TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS TeacherNotifications (
+    id         SERIAL PRIMARY KEY,
+    teacher_id INTEGER NOT NULL REFERENCES Teachers(id),
+    message    TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS Notifications (
+    id         SERIAL PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES Students(id),
+    message    TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS Admins (
+    username VARCHAR(100) PRIMARY KEY,
+    password VARCHAR(255) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS OTP_CODES (
+    id         SERIAL PRIMARY KEY,
+    student_id INTEGER NOT NULL REFERENCES Students(id),
+    otp_code   VARCHAR(6) NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+CREATE TABLE IF NOT EXISTS Assignments (
+    id          SERIAL PRIMARY KEY,
+    course_id   INTEGER NOT NULL REFERENCES Courses(id),
+    teacher_id  INTEGER NOT NULL REFERENCES Teachers(id),
+    title       VARCHAR(200) NOT NULL,
+    description TEXT,
+    due_date    TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS Submissions (
+    id            SERIAL PRIMARY KEY,
+    assignment_id INTEGER NOT NULL REFERENCES Assignments(id),
+    student_id    INTEGER NOT NULL REFERENCES Students(id),
+    file_path     VARCHAR(500),
+    submitted_at  TIMESTAMP NOT NULL DEFAULT NOW(),
+    marks         NUMERIC(5, 2)
+);
+CREATE TABLE IF NOT EXISTS Attendance (
+    id          SERIAL PRIMARY KEY,
+    student_id  INTEGER NOT NULL REFERENCES Students(id),
+    course_id   INTEGER NOT NULL REFERENCES Courses(id),
+    date_marked DATE NOT NULL,
+    present     INTEGER NOT NULL DEFAULT 0,
+    created_at  TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS StudentRisk (
+    id           SERIAL PRIMARY KEY,
+    student_id   INTEGER NOT NULL REFERENCES Students(id),
+    risk_score   DOUBLE PRECISION NOT NULL,
+    risk_label   VARCHAR(10) NOT NULL,
+    evaluated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    notified     BOOLEAN NOT NULL DEFAULT FALSE
+);
+"""
+
+# composite indexes matched to the WHERE / ORDER BY of the hot queries
+HOT_PATH_INDEXES = """
+CREATE INDEX IF NOT EXISTS attendance_student_date_idx ON Attendance (student_id, date_marked);
+CREATE INDEX IF NOT EXISTS studentcourses_student_course_idx ON StudentCourses (student_id, course_id);
+CREATE INDEX IF NOT EXISTS studentcourses_course_student_idx ON StudentCourses (course_id, student_id);
+CREATE INDEX IF NOT EXISTS teachercourses_teacher_course_idx ON TeacherCourses (teacher_id, course_id);
+CREATE INDEX IF NOT EXISTS notifications_student_created_idx ON Notifications (student_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS teachernotifications_teacher_created_idx ON TeacherNotifications (teacher_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS teacherposts_teacher_created_idx ON TeacherPosts (teacher_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS studentrisk_student_id_idx ON StudentRisk (student_id, id DESC);
+CREATE INDEX IF NOT EXISTS submissions_assignment_student_idx ON Submissions (assignment_id, student_id);
+CREATE INDEX IF NOT EXISTS submissions_student_idx ON Submissions (student_id);
+CREATE INDEX IF NOT EXISTS assignments_course_idx ON Assignments (course_id);
+CREATE INDEX IF NOT EXISTS assignments_teacher_due_idx ON Assignments (teacher_id, due_date DESC);
+CREATE INDEX IF NOT EXISTS otp_codes_student_expires_idx ON OTP_CODES (student_id, expires_at DESC);
+"""
+
+# one attendance row per student, course and day; AttendanceModel.mark_attendance_bulk's
+# upsert relies on it. Deleting duplicates and building a unique index on a live
+# table is migration work, never something a request should trigger.
+ATTENDANCE_UNIQUE_DDL = """
+DO $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    IF to_regclass('attendance_student_course_date_uq') IS NULL THEN
+        -- keep the newest row of any (student, course, day) duplicates
+        DELETE FROM Attendance a
+        USING Attendance b
+        WHERE a.student_id = b.student_id
+          AND a.course_id = b.course_id
+          AND a.date_marked = b.date_marked
+          AND a.id < b.id;
+        GET DIAGNOSTICS removed = ROW_COUNT;
+        CREATE UNIQUE INDEX attendance_student_course_date_uq
+            ON Attendance (student_id, course_id, date_marked);
+        IF removed > 0 AND to_regclass('attendancedaily') IS NOT NULL THEN
+            TRUNCATE AttendanceDaily;
+            INSERT INTO AttendanceDaily (student_id, course_id, day, present_count, total_count)
+            SELECT student_id, course_id, DATE(date_marked), COALESCE(SUM(present), 0), COUNT(*)
+            FROM Attendance
+            GROUP BY student_id, course_id, DATE(date_marked);
+        END IF;
+    END IF;
+END $$;
+"""
+
+# serves AttendanceModel.SHEET_SQL (one course, one day). A plain CREATE INDEX
+# blocks writes to Attendance while it builds, so it is not run per request.
+ATTENDANCE_SHEET_INDEX_DDL = """
+CREATE INDEX IF NOT EXISTS attendance_course_date_student_idx
+    ON Attendance (course_id, date_marked, student_id);
+"""
+
+# content-addressed uploads (storage.py). ALTER TABLE takes an ACCESS EXCLUSIVE
+# lock on Submissions even when the column exists, so this never runs per request.
+SUBMISSION_STORAGE_DDL = """
+ALTER TABLE Submissions ADD COLUMN IF NOT EXISTS file_name VARCHAR(255);
+ALTER TABLE Submissions ADD COLUMN IF NOT EXISTS file_sha256 CHAR(64);
+ALTER TABLE Submissions ADD COLUMN IF NOT EXISTS file_size BIGINT;
+CREATE INDEX IF NOT EXISTS submissions_file_sha256_idx ON Submissions (file_sha256);
+"""
+
+# incremental training change log (ml_model.py): the triggers stamp every
+# student whose marks or attendance rollup changed with the writing
+# transaction's id; runs train on stamps below a snapshot's xmin
+FEATURE_CHANGES_DDL = """
+DO $do$
+BEGIN
+    IF to_regclass('studentfeaturechanges') IS NULL THEN
+        CREATE TABLE StudentFeatureChanges (
+            student_id  INTEGER PRIMARY KEY,
+            change_txid BIGINT NOT NULL
+        );
+        CREATE INDEX studentfeaturechanges_txid_idx ON StudentFeatureChanges (change_txid);
+
+        CREATE OR REPLACE FUNCTION student_feature_changed() RETURNS trigger LANGUAGE plpgsql AS $fn$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO StudentFeatureChanges (student_id, change_txid)
+                SELECT student_id, txid_current()
+                FROM (SELECT DISTINCT student_id FROM new_rows) d
+                ON CONFLICT (student_id) DO UPDATE SET change_txid = EXCLUDED.change_txid;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO StudentFeatureChanges (student_id, change_txid)
+                SELECT student_id, txid_current()
+                FROM (SELECT DISTINCT student_id FROM old_rows) d
+                ON CONFLICT (student_id) DO UPDATE SET change_txid = EXCLUDED.change_txid;
+            END IF;
+            RETURN NULL;
+        END
+        $fn$;
+
+        CREATE TRIGGER studentcourses_feature_ins AFTER INSERT ON StudentCourses
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE student_feature_changed();
+        CREATE TRIGGER studentcourses_feature_upd AFTER UPDATE ON StudentCourses
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE student_feature_changed();
+        CREATE TRIGGER studentcourses_feature_del AFTER DELETE ON StudentCourses
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE student_feature_changed();
+        CREATE TRIGGER attendancedaily_feature_ins AFTER INSERT ON AttendanceDaily
+            REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE student_feature_changed();
+        CREATE TRIGGER attendancedaily_feature_upd AFTER UPDATE ON AttendanceDaily
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE student_feature_changed();
+        CREATE TRIGGER attendancedaily_feature_del AFTER DELETE ON AttendanceDaily
+            REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE student_feature_changed();
+    END IF;
+END
+$do$;
+"""
+
+# (version, name, sql) -- append only; never edit an applied migration
+MIGRATIONS = [
+    (1, "core schema", CORE_SCHEMA),
+    (2, "hot path indexes", HOT_PATH_INDEXES),
+    (3, "attendance unique day", ATTENDANCE_UNIQUE_DDL),
+    (4, "attendance sheet index", ATTENDANCE_SHEET_INDEX_DDL),
+    (5, "attendance rollup", AttendanceRollup.DDL),
+    (6, "risk snapshot", RISK_SNAPSHOT_DDL),
+    (7, "email outbox", OUTBOX_DDL),
+    (8, "notification feeds", NOTIFICATION_FEED_DDL),
+    (9, "submission storage", SUBMISSION_STORAGE_DDL),
+    (10, "feature change tracking", FEATURE_CHANGES_DDL),
+]
+
+# (name, sql, params): the statements models.py / ml_model.py actually run, with sample params
+_TODAY = date.today()
+HOT_QUERIES = [
+    ("student notifications page",
+     feed_page_sql("Notifications", "student_id", True), (1, _TODAY, 2**31 - 1, 21)),
+    ("teacher notifications page",
+     feed_page_sql("TeacherNotifications", "teacher_id", True), (1, _TODAY, 2**31 - 1, 21)),
+    ("unread counter", UNREAD_COUNT_SQL, ("student", 1)),
+    ("teacher posts", TEACHER_POSTS_SQL, (1,)),
+    ("teacher courses", TEACHER_COURSES_SQL, (1,)),
+    ("teacher assignments", TeacherDashboard.ASSIGNMENTS_SQL, (1,)),
+    ("teacher attendance summary", TeacherDashboard.ATTENDANCE_SQL, (1, _TODAY)),
+    ("course roster", Notification.COURSE_RECIPIENTS_SQL, (1,)),
+    ("attendance sheet", AttendanceModel.SHEET_SQL, (_TODAY, _TODAY, 1)),
+    ("attendance rollup window", *AttendanceRollup.percent_query(1, 1, _TODAY)),
+    ("risk features", *feature_matrix_query([1, 2, 3], _TODAY)),
+    ("latest risk flag", PREVIOUS_NOTIFIED_SQL, ([1, 2, 3],)),
+    ("assignment submissions", Submission.FOR_ASSIGNMENT_SQL, (1,)),
+    ("student submissions", Submission.FOR_STUDENT_SQL, (1,)),
+    ("changed students", CHANGED_STUDENTS_SQL, (0, 10)),
+    ("latest otp", OTP.LATEST_SQL, (1,)),
+]
+
+MIGRATIONS_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS SchemaMigrations (
+    version    INTEGER PRIMARY KEY,
+    name       VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+)
+"""
+
+def applied_versions():
+    execute_query(MIGRATIONS_TABLE_DDL)
+    rows = execute_query("SELECT version FROM SchemaMigrations", fetch=True)
+    return {r[0] for r in rows or []}
+
+def upgrade():
+    done = applied_versions()
+    pending = [m for m in MIGRATIONS if m[0] not in done]
+    if not pending:
+        print("✅ Schema is up to date.")
+        return 0
+    for version, name, sql in pending:
+        # each migration and its bookkeeping row commit together
+        with transaction() as cur:
+            cur.execute(sql)
+            cur.execute("INSERT INTO SchemaMigrations (version, name) VALUES (%s, %s)", (version, name))
+        print(f"✔ Applied migration {version}: {name}")
+    return len(pending)
+
+def status():
+    done = applied_versions()
+    for version, name, _ in MIGRATIONS:
+        print(f"{'applied' if version in done else 'pending':>8}  {version:>3}  {name}")
+
+def _seq_scans(plan, found=None):
+    found = [] if found is None else found
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        _seq_scans(child, found)
+    return found
+
+def check_plans():
+    """
+    EXPLAIN every hot query with enable_seqscan off. The planner still picks a
+    Seq Scan when no usable index exists, so any Seq Scan left is a missing index.
+    Returns the list of (query name, [tables]) that failed.
+    """
+    failures = []
+    with transaction() as cur:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, sql, params in HOT_QUERIES:
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            tables = _seq_scans(plan[0]["Plan"])
+            print(f"{'❌' if tables else '✔'} {name}" + (f"  (Seq Scan on {', '.join(tables)})" if tables else ""))
+            if tables:
+                failures.append((name, tables))
+    return failures
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if cmd == "upgrade":
+        upgrade()
+    elif cmd == "status":
+        status()
+    elif cmd == "check":
+        sys.exit(1 if check_plans() else 0)
+    else:
+        print("Usage: python migrations.py [upgrade|status|check]")
+        sys.exit(2)
@@ -1,16 +1,28 @@
 # ml_model.py (cleaned, lookback = 90 days)
 import os
-import joblib
+import io
+import copy
+import json
+import time
+import pstats
+import cProfile
+import hashlib
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
 import numpy as np
 from datetime import datetime, timedelta, date
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
-from db import execute_query
-from models import send_email, send_sms, send_notification_contacts_for_student
+from psycopg2.extras import execute_values
+from db import execute_query, transaction, require_relation, iter_query, statement_stats
+from models import send_email, send_sms, send_notification_contacts_for_student, AttendanceRollup
+from model_artifact import LinearRiskModel
+
+# sklearn and joblib are imported inside the training / pickle functions only:
+# the web process scores with the NumPy artifact and never loads them.
 
 MODEL_DIR = os.path.join(os.getcwd(), "models")
-MODEL_PATH = os.path.join(MODEL_DIR, "risk_model.pkl")
+MODEL_PATH = os.path.join(MODEL_DIR, "risk_model.pkl")        # full sklearn pipeline, kept for retraining
+ARTIFACT_PATH = os.path.join(MODEL_DIR, "risk_model.npz")     # NumPy-only artifact used for scoring
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 MIN_TRAIN_ROWS = 10
@@ -18,54 +30,218 @@ LOOKBACK_DAYS = 90                   # <-- changed to 90 days
 ATTENDANCE_THRESHOLD = 60.0          # percent
 MARK_THRESHOLD = 40.0                # marks threshold
 MIN_SUBJECTS = 6
+FEATURE_NAMES = ("avg_marks", "attendance_pct", "below_count")
 RISK_SCORE_THRESHOLD = 0.6
+RISK_SNAPSHOT_TTL = float(os.getenv("RISK_SNAPSHOT_TTL", 300))             # seconds a teacher's at-risk list is cached
+RISK_RESCORE_INTERVAL = float(os.getenv("RISK_RESCORE_INTERVAL", 3600))    # rescore in background when older than this
+FEATURE_BATCH_SIZE = int(os.getenv("FEATURE_BATCH_SIZE", 5000))            # rows per batch when streaming features
+INCREMENTAL_BATCH_SIZE = int(os.getenv("INCREMENTAL_BATCH_SIZE", 1000))    # students per partial_fit mini-batch
+INCREMENTAL_EPOCHS = int(os.getenv("INCREMENTAL_EPOCHS", 5))               # passes when bootstrapping an SGD model
+
+# ---------------- stage profiler ----------------
+class StageProfiler:
+    """
+    Wall time, DB statement count and (optionally) peak traced memory and a
+    cProfile summary for each named stage of training / scoring. Stages nest;
+    a stage's name is its path ("train/fit"). Only active in the thread
+    running profile(); elsewhere the _stage() markers below are no-ops.
+    """
 
-# ---------------- helper DB fetchers ----------------
-def _fetch_students():
-    rows = execute_query("SELECT id, name, email, parent_email FROM Students", fetch=True)
-    return rows or []
+    def __init__(self, cprofile=False, memory=False, top=15):
+        self.cprofile = cprofile
+        self.memory = memory
+        self.top = top
+        self.stages = []
+        self._stack = []
+
+    @staticmethod
+    def _queries():
+        return sum(st["calls"] for st in statement_stats().values())
+
+    @contextmanager
+    def stage(self, name):
+        parent = self._stack[-1] if self._stack else None
+        rec = {"stage": f"{parent['stage']}/{name}" if parent else name, "depth": len(self._stack)}
+        self.stages.append(rec)
+        if self.memory:
+            if parent is not None:
+                parent["_peak"] = max(parent["_peak"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            rec["_peak"] = 0
+            rec["_mem_start"] = tracemalloc.get_traced_memory()[0]
+        q0 = self._queries()
+        prof = None
+        if self.cprofile:
+            # one profiler can be active at a time: pause the parent's while the child runs
+            if parent is not None and parent.get("_prof"):
+                parent["_prof"].disable()
+            prof = rec["_prof"] = cProfile.Profile()
+            prof.enable()
+        self._stack.append(rec)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["seconds"] = round(time.perf_counter() - t0, 6)
+            if prof is not None:
+                prof.disable()
+            rec["queries"] = self._queries() - q0
+            self._stack.pop()
+            if prof is not None:
+                rec["top_functions"] = self._top_functions(prof)
+                del rec["_prof"]
+                if parent is not None and parent.get("_prof"):
+                    parent["_prof"].enable()
+            if self.memory:
+                peak = max(rec["_peak"], tracemalloc.get_traced_memory()[1])
+                # peak traced memory above what was allocated when the stage began
+                rec["peak_kb"] = round((peak - rec.pop("_mem_start")) / 1024, 1)
+                del rec["_peak"]
+                if parent is not None:
+                    parent["_peak"] = max(parent["_peak"], peak)
+
+    def _top_functions(self, prof):
+        stats = pstats.Stats(prof, stream=io.StringIO()).sort_stats("cumulative")
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in list(stats.stats.items()):
+            rows.append({"function": f"{os.path.basename(filename)}:{line}({func})",
+                         "ncalls": nc, "tottime": round(tt, 6), "cumtime": round(ct, 6)})
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        return rows[:self.top]
+
+    def report(self):
+        return {"stages": self.stages,
+                "total_seconds": round(sum(r["seconds"] for r in self.stages if r["depth"] == 0), 6)}
+
+# per thread: the background rescore and request threads must not share one stage stack
+_active = threading.local()
+
+def _stage(name):
+    prof = getattr(_active, "profiler", None)
+    return prof.stage(name) if prof is not None else nullcontext()
+
+def profile(fn, *args, cprofile=False, memory=False, report_path=None, **kwargs):
+    """
+    Run fn(*args, **kwargs) (e.g. train_and_save_model or predict_all_students)
+    with stage profiling on. Returns (fn's result, report dict); the report is
+    also written as JSON to `report_path` when given.
+    """
+    prof = StageProfiler(cprofile=cprofile, memory=memory)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _active.profiler = prof
+    try:
+        with prof.stage(getattr(fn, "__name__", "run")):
+            result = fn(*args, **kwargs)
+    finally:
+        _active.profiler = None
+        if started_tracing:
+            tracemalloc.stop()
+    report = prof.report()
+    report["started_at"] = datetime.now().isoformat(timespec="seconds")
+    if report_path:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return result, report
 
-def _get_student_marks(student_id):
-    rows = execute_query("SELECT COALESCE(marks, 0) FROM StudentCourses WHERE student_id=%s", (student_id,), fetch=True)
-    if not rows:
-        return []
-    return [float(r[0]) for r in rows]
+# ---------------- helper DB fetchers ----------------
+def _fetch_student_names():
+    """{id: name} for every student."""
+    return dict(execute_query("SELECT id, name FROM Students", fetch=True) or [])
+
+def _fetch_contacts(student_ids):
+    """{id: (email, parent_email)} for just the given students."""
+    if not student_ids:
+        return {}
+    rows = execute_query("SELECT id, email, parent_email FROM Students WHERE id = ANY(%s)",
+                         (list(student_ids),), fetch=True)
+    return {sid: (email, parent_email) for sid, email, parent_email in rows or []}
+
+# ---------------- batched feature extraction ----------------
+def feature_matrix_query(student_ids, cutoff):
+    """(sql, params) for _fetch_feature_matrix: every student, or only `student_ids`."""
+    if student_ids is None:
+        id_filter_sc = id_filter_att = id_filter_s = ""
+        params = (MARK_THRESHOLD, cutoff)
+    else:
+        ids = [int(i) for i in student_ids]
+        id_filter_sc = "WHERE student_id = ANY(%s)"
+        id_filter_att = "AND student_id = ANY(%s)"
+        id_filter_s = "WHERE s.id = ANY(%s)"
+        params = (MARK_THRESHOLD, ids, cutoff, ids, ids)
+
+    q = f"""
+        SELECT s.id,
+               COALESCE(m.n_marks, 0),
+               COALESCE(m.sum_marks, 0),
+               COALESCE(m.n_below, 0),
+               COALESCE(att.pct, 0)
+        FROM Students s
+        LEFT JOIN (
+            SELECT student_id,
+                   COUNT(*) AS n_marks,
+                   SUM(COALESCE(marks, 0))::float AS sum_marks,
+                   COUNT(*) FILTER (WHERE COALESCE(marks, 0) < %s) AS n_below
+            FROM StudentCourses
+            {id_filter_sc}
+            GROUP BY student_id
+        ) m ON m.student_id = s.id
+        LEFT JOIN (
+            SELECT student_id, SUM(present_count)::float / NULLIF(SUM(total_count), 0) * 100 AS pct
+            FROM AttendanceDaily
+            WHERE day >= %s {id_filter_att}
+            GROUP BY student_id
+        ) att ON att.student_id = s.id
+        {id_filter_s}
+        ORDER BY s.id
+    """
+    return q, params
 
-def _get_student_attendance_percent(student_id, lookback_days=LOOKBACK_DAYS):
+def _fetch_feature_matrix(student_ids=None, lookback_days=LOOKBACK_DAYS):
     """
-    Compute attendance percent over the past `lookback_days` using a Python computed cutoff date.
-    Returns a float 0..100
+    Pull marks aggregates, below-threshold counts and the attendance percent
+    for all students (or only `student_ids`) in one grouped query.
+    Returns (ids, X): ids is an int array, X has one row per id with
+    [avg_marks, attendance_pct, below_count] and the same MIN_SUBJECTS
+    padding as the per-student path (missing subjects count as 0 marks).
     """
+    AttendanceRollup.ensure()
     cutoff = date.today() - timedelta(days=int(lookback_days))
-    q = """
-        SELECT COALESCE(AVG(present)::float, 0) * 100
-        FROM Attendance a
-        WHERE a.student_id=%s AND a.date_marked >= %s
-    """
-    data = execute_query(q, (student_id, cutoff), fetch=True)
-    if not data:
-        return 0.0
-    return float(data[0][0] or 0.0)
-
-# ---------------- feature / label builders ----------------
-def _feature_vector_for_student(student_id):
-    marks = _get_student_marks(student_id)
-    if marks:
-        avg_marks = float(sum(marks) / len(marks))
+    q, params = feature_matrix_query(student_ids, cutoff)
+    # the whole-school pass streams in batches so only one batch of row tuples is alive at a time
+    if student_ids is None:
+        batches = iter_query(q, params, batch_size=FEATURE_BATCH_SIZE)
     else:
-        avg_marks = 0.0
-
-    attendance_pct = _get_student_attendance_percent(student_id)
-    below_count = sum(1 for m in marks if m < MARK_THRESHOLD)
+        batches = [execute_query(q, params, fetch=True) or []]
+    id_parts, data_parts = [], []
+    for batch in batches:
+        if batch:
+            id_parts.append(np.array([r[0] for r in batch], dtype=np.int64))
+            data_parts.append(np.array([r[1:] for r in batch], dtype=float))
+    if not id_parts:
+        return np.empty((0,), dtype=np.int64), np.empty((0, 3))
+
+    ids = np.concatenate(id_parts)
+    data = np.concatenate(data_parts)
+    n_marks, sum_marks, n_below, attendance = data.T
 
     # pad if fewer than MIN_SUBJECTS so features are consistent
-    if len(marks) < MIN_SUBJECTS:
-        pad = [0.0] * (MIN_SUBJECTS - len(marks))
-        marks_padded = marks + pad
-        avg_marks = float(sum(marks_padded) / MIN_SUBJECTS)
-        below_count = sum(1 for m in marks_padded if m < MARK_THRESHOLD)
+    padded = n_marks < MIN_SUBJECTS
+    avg_marks = np.where(padded, sum_marks / MIN_SUBJECTS, sum_marks / np.maximum(n_marks, 1))
+    if MARK_THRESHOLD > 0:
+        n_below = np.where(padded, n_below + (MIN_SUBJECTS - n_marks), n_below)
 
-    return [avg_marks, attendance_pct, below_count]
+    return ids, np.column_stack([avg_marks, attendance, n_below])
+
+# ---------------- feature / label builders ----------------
+def _feature_vector_for_student(student_id):
+    ids, X = _fetch_feature_matrix([student_id])
+    if len(ids) == 0:
+        # unknown student: no marks and no attendance, padded like everyone else
+        return [0.0, 0.0, MIN_SUBJECTS if MARK_THRESHOLD > 0 else 0]
+    avg_marks, attendance_pct, below_count = X[0]
+    return [float(avg_marks), float(attendance_pct), int(below_count)]
 
 def _label_from_rules(avg_marks, attendance_pct, below_count):
     # deterministic rule for "at-risk" used to bootstrap training labels
@@ -73,31 +249,18 @@ def _label_from_rules(avg_marks, attendance_pct, below_count):
         return 1
     return 0
 
+def _labels_from_rules(X):
+    """Vectorised _label_from_rules over a feature matrix."""
+    if X.shape[0] == 0:
+        return np.empty((0,), dtype=int)
+    return ((X[:, 1] < ATTENDANCE_THRESHOLD) | (X[:, 2] >= 3)).astype(int)
+
 # ---------------- dataset builders ----------------
 def _build_training_dataset():
-    X = []
-    y = []
-    students = _fetch_students()
-    for sid, *_ in students:
-        marks = _get_student_marks(sid)
-        attendance = _get_student_attendance_percent(sid)
-        below_count = sum(1 for m in marks if m < MARK_THRESHOLD)
-        if marks:
-            avg_marks = float(sum(marks) / len(marks))
-        else:
-            avg_marks = 0.0
-
-        if len(marks) < MIN_SUBJECTS:
-            pad = [0.0] * (MIN_SUBJECTS - len(marks))
-            marks_padded = marks + pad
-            avg_marks = float(sum(marks_padded) / MIN_SUBJECTS)
-            below_count = sum(1 for m in marks_padded if m < MARK_THRESHOLD)
-
-        X.append([avg_marks, attendance, below_count])
-        y.append(_label_from_rules(avg_marks, attendance, below_count))
-
-    X = np.array(X) if X else np.empty((0, 3))
-    y = np.array(y) if y else np.empty((0,))
+    with _stage("fetch_features"):
+        _, X = _fetch_feature_matrix()
+    with _stage("labels"):
+        y = _labels_from_rules(X)
     return X, y
 
 def _generate_synthetic_data(n_needed):
@@ -116,14 +279,23 @@ def _generate_synthetic_data(n_needed):
     return np.array(X), np.array(y)
 
 # ---------------- training / model persistence ----------------
-def train_and_save_model(force_retrain=False):
+def train_and_save_model(force_retrain=False, incremental=False):
+    """
+    Full refit of the StandardScaler + LogisticRegression pipeline on every student.
+    incremental=True delegates to train_incremental() (SGD partial_fit on changed students only).
+    """
+    if incremental:
+        return train_incremental()
+    with _stage("watermark"):
+        watermark = _current_watermark()
     X, y = _build_training_dataset()
 
     # bootstrap with synthetic if too few rows
     if X.shape[0] < MIN_TRAIN_ROWS:
         need = MIN_TRAIN_ROWS - X.shape[0]
         if need > 0:
-            Xs, ys = _generate_synthetic_data(need)
+            with _stage("synthetic"):
+                Xs, ys = _generate_synthetic_data(need)
             if X.shape[0] == 0:
                 X, y = Xs, ys
             else:
@@ -134,132 +306,521 @@ def train_and_save_model(force_retrain=False):
         print("Not enough data to train even after synthetic augmentation.")
         return None
 
-    pipeline = Pipeline([
+    pipeline = _new_lr_pipeline()
+    with _stage("fit"):
+        pipeline.fit(X, y)
+    pipeline.training_watermark_ = watermark
+    pipeline.watermark_kind_ = WATERMARK_KIND
+    _save_model(pipeline)
+    print("✅ Model trained & saved to", MODEL_PATH, "and", ARTIFACT_PATH)
+    return pipeline
+
+def _new_lr_pipeline():
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.linear_model import LogisticRegression
+    return Pipeline([
         ("scaler", StandardScaler()),
         ("clf", LogisticRegression(max_iter=1000))
     ])
-    pipeline.fit(X, y)
-    joblib.dump(pipeline, MODEL_PATH)
-    print("✅ Model trained & saved to", MODEL_PATH)
+
+def _save_model(model):
+    """
+    Pickle the full pipeline (what train_incremental resumes from) and export
+    the NumPy artifact the scorers load; the registry is handed the artifact
+    model so this process scores exactly what other processes will load.
+    """
+    import joblib
+    # write to a temp file and rename so readers never see a half-written pickle
+    tmp_path = f"{MODEL_PATH}.{os.getpid()}.tmp"
+    with _stage("dump"):
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, MODEL_PATH)
+    with _stage("export_artifact"):
+        artifact = _export_artifact(model)
+    with _stage("publish"):
+        _registry.publish(artifact)
+
+def _export_artifact(pipeline):
+    artifact = LinearRiskModel.from_pipeline(pipeline, feature_names=FEATURE_NAMES,
+                                             pipeline_sha256=_file_digest(MODEL_PATH))
+    artifact.save(ARTIFACT_PATH)
+    return artifact
+
+def _load_pipeline():
+    """The pickled sklearn pipeline, for training code only (None if there is none)."""
+    if not os.path.exists(MODEL_PATH):
+        return None
+    import joblib
+    return joblib.load(MODEL_PATH)
+
+def export_model_artifact():
+    """
+    (Re)write ARTIFACT_PATH from the saved pipeline, e.g. for a pickle trained
+    before artifacts existed. Returns the artifact model, or None without a pickle.
+    """
+    pipeline = _load_pipeline()
+    if pipeline is None:
+        return None
+    artifact = _export_artifact(pipeline)
+    _registry.publish(artifact)
+    print("✅ Exported model artifact to", ARTIFACT_PATH)
+    return artifact
+
+# ---------------- incremental training ----------------
+# Triggers on StudentCourses (marks) and AttendanceDaily (attendance) stamp
+# each touched student with the id of the writing transaction (change_txid).
+# A sequence value is not a usable high-water mark: a transaction can draw a
+# lower value and commit after a higher one was read. Instead the watermark is
+# the xmin of a snapshot -- every transaction below it has finished, so all of
+# their stamps are visible -- and a run trains on stamps in [since, upto).
+# Stamps at or above upto (still running, or committed out of order) are
+# picked up by the next run. A saved model records its watermark in
+# training_watermark_ (with watermark_kind_ = WATERMARK_KIND).
+# The table and triggers come from migration 10 (FEATURE_CHANGES_DDL in migrations.py).
+WATERMARK_KIND = "txid_xmin"
+
+CHANGED_STUDENTS_SQL = """
+SELECT student_id FROM StudentFeatureChanges
+WHERE change_txid >= %s AND change_txid < %s
+ORDER BY student_id
+"""
+
+def _current_watermark():
+    """xmin of a fresh snapshot: every stamp below it is committed (or rolled back) and visible."""
+    require_relation("StudentFeatureChanges")
+    return execute_query("SELECT txid_snapshot_xmin(txid_current_snapshot())", fetch=True)[0][0]
+
+def _changed_students(since, upto):
+    return [r[0] for r in iter_query(CHANGED_STUDENTS_SQL, (since, upto))]
+
+def _new_sgd_pipeline():
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.linear_model import SGDClassifier
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("clf", SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42)),
+    ])
+
+def _partial_fit(pipeline, X, y):
+    """
+    One mini-batch for the classifier. The scaler is fitted once on every
+    student at bootstrap and then frozen: a changed student's rows are seen
+    again on every change, so partial_fit on the scaler would pull its mean
+    and variance towards frequently edited students. The next full refit
+    re-estimates it.
+    """
+    scaler, clf = pipeline.named_steps["scaler"], pipeline.named_steps["clf"]
+    clf.partial_fit(scaler.transform(X), y, classes=np.array([0, 1]))
+
+def train_incremental(batch_size=INCREMENTAL_BATCH_SIZE):
+    """
+    Update the saved SGD pipeline with partial_fit on the students whose marks
+    or attendance changed since the model's training watermark. With no
+    incremental model to start from (first run, or the saved model is the
+    LogisticRegression one) it bootstraps an SGD pipeline from every student
+    in INCREMENTAL_EPOCHS passes of mini-batches.
+    Returns the saved pipeline, or the current one when nothing changed.
+    """
+    upto = _current_watermark()
+    current = _load_pipeline()
+    since = getattr(current, "training_watermark_", None)
+    if getattr(current, "watermark_kind_", None) != WATERMARK_KIND:
+        since = None        # saved before txid watermarks: its value is not comparable
+    clf = getattr(current, "named_steps", {}).get("clf")
+
+    if since is None or not hasattr(clf, "partial_fit"):
+        print("ℹ️ No incremental model yet; bootstrapping SGD pipeline from all students.")
+        X, y = _build_training_dataset()
+        if X.shape[0] < MIN_TRAIN_ROWS:
+            Xs, ys = _generate_synthetic_data(MIN_TRAIN_ROWS - X.shape[0])
+            X, y = (Xs, ys) if X.shape[0] == 0 else (np.vstack([X, Xs]), np.concatenate([y, ys]))
+        pipeline = _new_sgd_pipeline()
+        pipeline.named_steps["scaler"].fit(X)
+        rng = np.random.RandomState(42)
+        for _ in range(INCREMENTAL_EPOCHS):
+            order = rng.permutation(X.shape[0])
+            for lo in range(0, len(order), batch_size):
+                idx = order[lo:lo + batch_size]
+                _partial_fit(pipeline, X[idx], y[idx])
+        trained = X.shape[0]
+    else:
+        changed = _changed_students(since, upto)
+        if not changed:
+            print(f"✅ Model is current (watermark {since}); nothing to train.")
+            return current
+        # never mutate the instance other threads are scoring with
+        pipeline = copy.deepcopy(current)
+        trained = 0
+        for lo in range(0, len(changed), batch_size):
+            _, X = _fetch_feature_matrix(changed[lo:lo + batch_size])
+            if X.shape[0]:
+                _partial_fit(pipeline, X, _labels_from_rules(X))
+                trained += X.shape[0]
+
+    pipeline.training_watermark_ = upto
+    pipeline.watermark_kind_ = WATERMARK_KIND
+    _save_model(pipeline)
+    print(f"✅ Incremental model updated on {trained} students (watermark {since} -> {upto}), saved to {MODEL_PATH}")
     return pipeline
 
+# ---------------- model registry ----------------
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class _ModelRegistry:
+    """
+    Process-wide cache of the loaded risk model.
+    Every lookup stats the model file; it is only re-loaded (with `loader`)
+    when its mtime/size changed *and* its content hash differs from the loaded one.
+    The (model, stamp, digest) triple is swapped in one assignment, so
+    concurrent requests always see a complete model.
+    """
+
+    def __init__(self, path, loader):
+        self.path = path
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._current = (None, None, None)    # (model, (mtime_ns, size), sha256)
+        self._stats = {"loads": 0, "reloads": 0, "skipped_reloads": 0, "hits": 0,
+                       "last_load_ms": 0.0, "total_load_ms": 0.0, "last_loaded_at": None}
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self):
+        stamp = self._stamp()
+        if stamp is None:
+            return None
+        model, loaded_stamp, _ = self._current
+        if model is not None and loaded_stamp == stamp:
+            self._stats["hits"] += 1
+            return model
+
+        with self._lock:
+            model, loaded_stamp, loaded_digest = self._current
+            if model is not None and loaded_stamp == stamp:
+                return model
+            digest = _file_digest(self.path)
+            if model is not None and digest == loaded_digest:
+                # touched or rewritten with identical bytes: keep the loaded object
+                self._current = (model, stamp, digest)
+                self._stats["skipped_reloads"] += 1
+                return model
+
+            start = time.perf_counter()
+            new_model = self.loader(self.path)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._current = (new_model, stamp, digest)
+            self._stats["reloads" if model is not None else "loads"] += 1
+            self._stats["last_load_ms"] = elapsed_ms
+            self._stats["total_load_ms"] += elapsed_ms
+            self._stats["last_loaded_at"] = datetime.now().isoformat(timespec="seconds")
+            return new_model
+
+    def publish(self, model):
+        """Install a model that was just written to `path` without reading it back."""
+        with self._lock:
+            self._current = (model, self._stamp(), _file_digest(self.path))
+
+    def stats(self):
+        s = dict(self._stats)
+        s["loaded"] = self._current[0] is not None
+        s["sha256"] = self._current[2]
+        return s
+
+_registry = _ModelRegistry(ARTIFACT_PATH, LinearRiskModel.load)
+
 def load_model():
-    if os.path.exists(MODEL_PATH):
-        return joblib.load(MODEL_PATH)
-    return None
+    """The current scoring model (a LinearRiskModel), or None if none has been trained."""
+    model = _registry.get()
+    if model is None and os.path.exists(MODEL_PATH):
+        # pipeline saved before artifacts existed: export it once
+        model = export_model_artifact()
+    return model
 
-# ---------------- prediction ----------------
-def predict_student_risk(student_id, model=None):
-    features = _feature_vector_for_student(student_id)
-    avg_marks, attendance_pct, below_count = features
-    rule_label = _label_from_rules(avg_marks, attendance_pct, below_count)
+def model_registry_stats():
+    """Load/reload counts, cache hits and load times of the in-process model."""
+    return _registry.stats()
 
-    if model is None:
-        model = load_model()
+# ---------------- prediction ----------------
+def score_feature_matrix(X, model=None):
+    """
+    Score a whole feature matrix with one predict_proba call.
+    Applies the rule boost and high/medium/low labelling as array operations.
+    Returns (risk_scores, risk_labels), both aligned with the rows of X.
+    With no model the scores fall back to the rule label (1.0 / 0.0).
+    """
+    X = np.asarray(X, dtype=float).reshape(-1, 3)
+    rule = _labels_from_rules(X) == 1
+    fallback = np.where(rule, 1.0, 0.0)
 
-    if model is None:
-        # fallback to rule-only
-        risk_score = 1.0 if rule_label == 1 else 0.0
+    if model is None or X.shape[0] == 0:
+        risk_scores = fallback
     else:
         try:
-            proba = model.predict_proba([features])[0]
+            proba = model.predict_proba(X)
             # determine index of class=1
-            if hasattr(model, "classes_") and 1 in list(model.classes_):
-                idx1 = list(model.classes_).index(1)
-                prob_risk = proba[idx1]
-            else:
-                prob_risk = proba[-1]
-            risk_score = float(prob_risk)
+            classes = list(getattr(model, "classes_", []))
+            idx1 = classes.index(1) if 1 in classes else -1
+            risk_scores = proba[:, idx1].astype(float)
         except Exception:
-            risk_score = 1.0 if rule_label == 1 else 0.0
+            risk_scores = fallback
 
     # Boost score if rule indicates risk
-    if rule_label == 1 and risk_score < 0.75:
-        risk_score = max(risk_score, 0.75)
+    risk_scores = np.where(rule & (risk_scores < 0.75), 0.75, risk_scores)
 
-    if risk_score >= 0.75:
-        risk_label = "high"
-    elif risk_score >= 0.5:
-        risk_label = "medium"
-    else:
-        risk_label = "low"
+    risk_labels = np.select(
+        [risk_scores >= 0.75, risk_scores >= 0.5],
+        ["high", "medium"],
+        default="low"
+    )
+    return risk_scores, risk_labels
 
+def _risk_result(student_id, features, risk_score, risk_label):
+    avg_marks, attendance_pct, below_count = features
     return {
         "student_id": student_id,
-        "avg_marks": avg_marks,
-        "attendance_pct": attendance_pct,
-        "below_count": below_count,
+        "avg_marks": float(avg_marks),
+        "attendance_pct": float(attendance_pct),
+        "below_count": int(below_count),
         "risk_score": float(risk_score),
-        "risk_label": risk_label
+        "risk_label": str(risk_label)
     }
 
+def predict_student_risk(student_id, model=None):
+    features = _feature_vector_for_student(student_id)
+
+    if model is None:
+        model = load_model()
+
+    scores, labels = score_feature_matrix([features], model)
+    return _risk_result(student_id, features, scores[0], labels[0])
+
+# ---------------- risk persistence ----------------
+def _risk_alert_message(r):
+    return (
+        f"Dear student,\n\n"
+        f"Our system detected that your academic risk score is {r['risk_score']:.2f} ({r['risk_label']}). "
+        f"This means you may require additional attention in academics or attendance.\n"
+        f"Please reach out to your teacher or academic advisor for support.\n\n"
+        f"Regards,\nStudent Performance System"
+    )
+
+PREVIOUS_NOTIFIED_SQL = """
+SELECT DISTINCT ON (student_id) student_id, notified
+FROM StudentRisk
+WHERE student_id = ANY(%s)
+ORDER BY student_id, id DESC
+"""
+
+def _previous_notified(student_ids):
+    """Latest StudentRisk.notified flag for each of `student_ids`, in one query."""
+    if not student_ids:
+        return {}
+    rows = execute_query(PREVIOUS_NOTIFIED_SQL, ([int(s) for s in student_ids],), fetch=True)
+    return {sid: notified is True for sid, notified in rows or []}
+
+# latest score per student, kept next to the StudentRisk history. Created and
+# backfilled by migration 6 only: the backfill sorts the whole history table.
+RISK_SNAPSHOT_DDL = """
+CREATE TABLE IF NOT EXISTS StudentRiskLatest (
+    student_id   INTEGER PRIMARY KEY,
+    risk_score   DOUBLE PRECISION NOT NULL,
+    risk_label   VARCHAR(10) NOT NULL,
+    evaluated_at TIMESTAMP NOT NULL
+);
+INSERT INTO StudentRiskLatest (student_id, risk_score, risk_label, evaluated_at)
+SELECT DISTINCT ON (student_id) student_id, risk_score, risk_label, COALESCE(evaluated_at, NOW())
+FROM StudentRisk
+ORDER BY student_id, id DESC
+ON CONFLICT (student_id) DO NOTHING;
+"""
+
+def save_risk_results(results, notified_ids=(), notifications=None, page_size=1000):
+    """
+    Persist a whole scoring run in one transaction:
+    - one multi-row INSERT into StudentRisk (notified=TRUE for `notified_ids`)
+    - one multi-row upsert into the StudentRiskLatest snapshot
+    - one multi-row INSERT into Notifications for `notifications` {student_id: message}
+    """
+    require_relation("StudentRiskLatest")
+    notified_ids = set(notified_ids)
+    risk_rows = [
+        (r["student_id"], float(r["risk_score"]), r["risk_label"], r["student_id"] in notified_ids)
+        for r in results
+    ]
+    with transaction() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO StudentRisk (student_id, risk_score, risk_label, evaluated_at, notified) VALUES %s",
+            risk_rows, template="(%s, %s, %s, NOW(), %s)", page_size=page_size
+        )
+        execute_values(
+            cur,
+            """
+            INSERT INTO StudentRiskLatest (student_id, risk_score, risk_label, evaluated_at) VALUES %s
+            ON CONFLICT (student_id) DO UPDATE
+            SET risk_score = EXCLUDED.risk_score,
+                risk_label = EXCLUDED.risk_label,
+                evaluated_at = EXCLUDED.evaluated_at
+            """,
+            # one row per student: ON CONFLICT cannot update the same row twice in one statement
+            list({row[0]: row[:3] for row in risk_rows}.values()),
+            template="(%s, %s, %s, NOW())", page_size=page_size
+        )
+        if notifications:
+            execute_values(
+                cur,
+                "INSERT INTO Notifications (student_id, message, created_at) VALUES %s",
+                list(notifications.items()), template="(%s, %s, NOW())", page_size=page_size
+            )
+
 def predict_all_students(threshold=RISK_SCORE_THRESHOLD, notify=True):
-    model = load_model()
+    with _stage("load_model"):
+        model = load_model()
     if model is None:
-        model = train_and_save_model()
+        with _stage("train"):
+            model = train_and_save_model()
         if model is None:
             print("Model unavailable and training failed.")
             return []
 
-    students = _fetch_students()
-    results = []
-
-    for sid, sname, semail, parent_email in students:
+    with _stage("fetch_names"):
+        names = _fetch_student_names()
+    with _stage("fetch_features"):
+        ids, X = _fetch_feature_matrix()
+    with _stage("score"):
+        scores, labels = score_feature_matrix(X, model)
+        results = []
+
+        for i, sid in enumerate(ids.tolist()):
+            sname = names.get(sid)
+            r = _risk_result(sid, X[i], scores[i], labels[i])
+            results.append({"id": sid, "name": sname, **r})
+
+    # ----------------------- ONE-TIME NOTIFICATION LOGIC -----------------------
+    at_risk = [r for r in results if r["risk_score"] >= threshold]
+    with _stage("previous_notified"):
+        already_notified = _previous_notified([r["student_id"] for r in at_risk])
+    to_notify = []
+    if notify:
+        to_notify = [r for r in at_risk if not already_notified.get(r["student_id"])]
+
+    messages = {r["student_id"]: _risk_alert_message(r) for r in to_notify}
+    # the flag carries over while a student stays above the threshold
+    notified_ids = {sid for sid, flag in already_notified.items() if flag} | set(messages)
+
+    try:
+        with _stage("save_results"):
+            save_risk_results(results, notified_ids=notified_ids, notifications=messages)
+    except Exception as e:
+        print("StudentRisk save error:", e)
+        return results
+
+    # send to student + parent once the rows are committed
+    with _stage("send_notifications"):
+        contacts = _fetch_contacts(messages)
+        for sid, msg in messages.items():
+            semail, parent_email = contacts.get(sid, (None, None))
+            try:
+                if semail:
+                    send_email(semail, "Risk alert from Student Portal", msg)
+                if parent_email:
+                    send_email(parent_email, "Risk alert for your child", msg)
+            except Exception as e:
+                print("Notification error:", e)
+    # --------------------------------------------------------------------------
 
-        r = predict_student_risk(sid, model)
+    return results
 
-        # Insert into StudentRisk table
+# ---------------- cached risk snapshot ----------------
+_snapshot_cache = {}            # teacher_id -> (expires_at, rows)
+_snapshot_lock = threading.Lock()
+_rescore_lock = threading.Lock()        # held by the one running background rescore
+
+def _fetch_teacher_risk_snapshot(teacher_id):
+    require_relation("StudentRiskLatest")
+    rows = execute_query("""
+        SELECT s.id, s.name, r.risk_score, r.risk_label, r.evaluated_at,
+               EXTRACT(EPOCH FROM NOW() - r.evaluated_at)::float
+        FROM Students s
+        JOIN StudentRiskLatest r ON r.student_id = s.id
+        WHERE s.id IN (
+            SELECT sc.student_id
+            FROM StudentCourses sc
+            JOIN TeacherCourses tc ON sc.course_id = tc.course_id
+            WHERE tc.teacher_id = %s
+        )
+        ORDER BY r.risk_score DESC, s.id
+    """, (teacher_id,), fetch=True)
+    return [
+        {"id": sid, "student_id": sid, "name": name, "risk_score": float(score),
+         "risk_label": label, "evaluated_at": evaluated_at, "age_seconds": age}
+        for sid, name, score, label, evaluated_at, age in rows or []
+    ]
+
+def refresh_risk_snapshot():
+    """Rescore every student (no notifications) and drop the cached teacher snapshots."""
+    try:
+        return predict_all_students(notify=False)
+    finally:
+        with _snapshot_lock:
+            _snapshot_cache.clear()
+
+def _refresh_in_background():
+    # test-and-claim in one step: concurrent requests cannot both start a rescore
+    if not _rescore_lock.acquire(blocking=False):
+        return
+
+    def run():
         try:
-            insert_q = """
-                INSERT INTO StudentRisk (student_id, risk_score, risk_label, evaluated_at)
-                VALUES (%s, %s, %s, NOW())
-            """
-            execute_query(insert_q, (sid, float(r['risk_score']), r['risk_label']))
+            refresh_risk_snapshot()
         except Exception as e:
-            print("StudentRisk insert error:", e)
-
-        results.append({"id": sid, "name": sname, **r})
+            print("Risk rescore error:", e)
+        finally:
+            _rescore_lock.release()
 
-        # ----------------------- ONE-TIME NOTIFICATION LOGIC -----------------------
-        if notify and r["risk_score"] >= threshold:
-            try:
-                row = execute_query(
-                    "SELECT notified FROM StudentRisk WHERE student_id=%s ORDER BY id DESC LIMIT 1",
-                    (sid,), fetch=True
-                )
-
-                already_notified = row and row[0][0] is True
-
-                if not already_notified:
-                    msg = (
-                        f"Dear student,\n\n"
-                        f"Our system detected that your academic risk score is {r['risk_score']:.2f} ({r['risk_label']}). "
-                        f"This means you may require additional attention in academics or attendance.\n"
-                        f"Please reach out to your teacher or academic advisor for support.\n\n"
-                        f"Regards,\nStudent Performance System"
-                        )
-
-
-                    # save notification
-                    execute_query(
-                        "INSERT INTO Notifications (student_id, message, created_at) VALUES (%s, %s, NOW())",
-                        (sid, msg)
-                    )
-
-                    # send to student + parent
-                    if semail:
-                        send_email(semail, "Risk alert from Student Portal", msg)
-                    if parent_email:
-                        send_email(parent_email, "Risk alert for your child", msg)
-
-                    # update flag
-                    execute_query(
-                        "UPDATE StudentRisk SET notified=TRUE WHERE student_id=%s ORDER BY id DESC LIMIT 1",
-                        (sid,)
-                    )
+    try:
+        threading.Thread(target=run, name="risk-rescore", daemon=True).start()
+    except Exception:
+        _rescore_lock.release()
+        raise
 
-            except Exception as e:
-                print("Notification error:", e)
-        # --------------------------------------------------------------------------
+def latest_risk_for_teacher(teacher_id, labels=None):
+    """
+    Latest risk score of each of the teacher's students, read from the
+    StudentRiskLatest snapshot and cached for RISK_SNAPSHOT_TTL seconds.
+    When the snapshot is older than RISK_RESCORE_INTERVAL (or empty) a
+    background rescore is started; the page never waits for it.
+    """
+    now = time.monotonic()
+    with _snapshot_lock:
+        cached = _snapshot_cache.get(teacher_id)
+    if cached and cached[0] > now:
+        rows = cached[1]
+    else:
+        rows = _fetch_teacher_risk_snapshot(teacher_id)
+        with _snapshot_lock:
+            _snapshot_cache[teacher_id] = (now + RISK_SNAPSHOT_TTL, rows)
 
-    return results
+        if rows:
+            stale = min(r["age_seconds"] for r in rows) > RISK_RESCORE_INTERVAL
+        else:
+            # nothing scored for this teacher; only rescore if nobody has been scored yet
+            stale = not execute_query("SELECT 1 FROM StudentRiskLatest LIMIT 1", fetch=True)
+        if stale:
+            _refresh_in_background()
+
+    if labels is None:
+        return list(rows)
+    return [r for r in rows if r["risk_label"] in labels]
@@ -0,0 +1,106 @@
+# model_artifact.py (compact, sklearn-free risk model artifact)
+#
+# The risk model is StandardScaler -> logistic classifier, so scoring is one
+# standardise, one dot product and a sigmoid. export() pulls those numbers out
+# of a fitted sklearn pipeline (LogisticRegression or SGDClassifier with
+# log_loss) into a small .npz:
+#   mean, scale       scaler statistics (n_features,)
+#   coef, intercept   logistic weights (n_features,), bias ()
+#   classes           class labels, column order of predict_proba
+#   meta              JSON string: version, kind, feature names, watermark, ...
+# LinearRiskModel.load() reads it back with NumPy alone (no pickle), so the
+# web process never imports sklearn or joblib. Only plain arrays are stored,
+# which also keeps the file loadable across sklearn upgrades.
+import os
+import json
+from datetime import datetime
+import numpy as np
+
+ARTIFACT_VERSION = 1
+ARTIFACT_KIND = "standard_scaler+logistic"
+
+class LinearRiskModel:
+    """
+    NumPy stand-in for the fitted pipeline: predict_proba / decision_function /
+    predict and classes_, with the same results as sklearn's binary
+    LogisticRegression / SGDClassifier(loss="log_loss") behind a StandardScaler.
+    """
+
+    def __init__(self, mean, scale, coef, intercept, classes, meta=None):
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.classes_ = np.asarray(classes)
+        self.meta = dict(meta or {})
+        self.training_watermark_ = self.meta.get("training_watermark")
+        n = self.coef.shape[0]
+        if self.coef.ndim != 1 or self.mean.shape != (n,) or self.scale.shape != (n,):
+            raise ValueError("Risk model artifact: mean, scale and coef must be 1-d and the same length")
+        if self.classes_.shape != (2,):
+            raise ValueError("Risk model artifact: only binary classifiers are supported")
+
+    @property
+    def n_features_in_(self):
+        return self.coef.shape[0]
+
+    @classmethod
+    def from_pipeline(cls, pipeline, feature_names=None, **meta):
+        """Extract the arrays from a fitted Pipeline([("scaler", ...), ("clf", ...)])."""
+        scaler, clf = pipeline.named_steps["scaler"], pipeline.named_steps["clf"]
+        coef = np.asarray(clf.coef_, dtype=float)
+        if coef.shape[0] != 1:
+            raise ValueError("Risk model artifact: only binary classifiers are supported")
+        coef = coef[0]
+        n = coef.shape[0]
+        # with_mean / with_std=False leave these as None
+        mean = np.zeros(n) if getattr(scaler, "mean_", None) is None else scaler.mean_
+        scale = np.ones(n) if getattr(scaler, "scale_", None) is None else scaler.scale_
+        meta = dict(meta)
+        meta.setdefault("training_watermark", getattr(pipeline, "training_watermark_", None))
+        meta.setdefault("classifier", type(clf).__name__)
+        if feature_names is not None:
+            meta["feature_names"] = list(feature_names)
+        return cls(mean, scale, coef, np.ravel(clf.intercept_)[0], clf.classes_, meta)
+
+    # ---------------- scoring ----------------
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=float).reshape(-1, self.n_features_in_)
+        return ((X - self.mean) / self.scale) @ self.coef + self.intercept
+
+    def predict_proba(self, X):
+        z = self.decision_function(X)
+        # numerically stable sigmoid: exp(-log(1 + exp(-z)))
+        p1 = np.exp(-np.logaddexp(0.0, -z))
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+    # ---------------- persistence ----------------
+    def save(self, path):
+        """Write the artifact to a temp file and rename it, so readers never see a partial file."""
+        meta = dict(self.meta, version=ARTIFACT_VERSION, kind=ARTIFACT_KIND,
+                    n_features=self.n_features_in_,
+                    exported_at=self.meta.get("exported_at") or datetime.now().isoformat(timespec="seconds"))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, mean=self.mean, scale=self.scale, coef=self.coef,
+                     intercept=np.float64(self.intercept), classes=self.classes_,
+                     meta=np.array(json.dumps(meta, sort_keys=True, default=str)))
+        os.replace(tmp_path, path)
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != ARTIFACT_VERSION or meta.get("kind") != ARTIFACT_KIND:
+                raise ValueError(f"Unsupported risk model artifact {meta.get('kind')} v{meta.get('version')} at {path}")
+            return cls(data["mean"], data["scale"], data["coef"], data["intercept"], data["classes"], meta)
+
+def export(pipeline, path, feature_names=None, **meta):
+    """Write `pipeline` as an artifact at `path`. Returns the LinearRiskModel that was written."""
+    model = LinearRiskModel.from_pipeline(pipeline, feature_names=feature_names, **meta)
+    model.save(path)
+    return model
@@ -1,39 +1,37 @@
 # models.py (Postgres-ready, notification-integrated)
 import os
 import random
-import smtplib
-from email.mime.text import MIMEText
 from dotenv import load_dotenv
 from twilio.rest import Client
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
-from db import execute_query
+from psycopg2.extras import execute_values
+from db import execute_query, ensure_schema, transaction
+from email_queue import enqueue_email, enqueue_emails, send_email_now
 
 load_dotenv()
 
-# ---------------- EMAIL / SMS UTILITIES ----------------
-def send_email(to_address, subject, body):
-    sender = os.getenv("EMAIL_ADDR")
-    app_password = os.getenv("EMAIL_APP_PASSWORD")
+EMAIL_QUEUE_ENABLED = os.getenv("EMAIL_QUEUE", "1") == "1"
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", 2))
+DASHBOARD_ATTENDANCE_DAYS = int(os.getenv("DASHBOARD_ATTENDANCE_DAYS", 180))
+NOTIFICATION_PAGE_SIZE = int(os.getenv("NOTIFICATION_PAGE_SIZE", 20))
 
-    msg = MIMEText(body)
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = to_address
-
-    if not sender or not app_password:
-        # Dev mode: print instead of sending
-        print(f"📧 [DEV MODE] send_email to {to_address} | Subject: {subject} | Body: {body}")
-        return
+_sms_executor = ThreadPoolExecutor(max_workers=SMS_WORKERS, thread_name_prefix="sms")
 
-    try:
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(sender, app_password)
-            server.send_message(msg)
-        print(f"✅ Email sent to: {to_address}")
-    except Exception as e:
-        print(f"❌ Email send error: {e}")
+# ---------------- EMAIL / SMS UTILITIES ----------------
+def send_email(to_address, subject, body):
+    """
+    Queue an email for the background dispatcher (email_queue.py).
+    Set EMAIL_QUEUE=0 to send inline instead.
+    """
+    if EMAIL_QUEUE_ENABLED:
+        try:
+            enqueue_email(to_address, subject, body)
+            return
+        except Exception as e:
+            print(f"❌ Email enqueue error, sending inline: {e}")
+    send_email_now(to_address, subject, body)
 
 def send_sms(to_phone, message):
     sid = os.getenv("TWILIO_SID")
@@ -52,6 +50,31 @@ def send_sms(to_phone, message):
     except Exception as e:
         print(f"❌ SMS send error: {e}")
 
+def _send_sms_many(phones, message):
+    sid = os.getenv("TWILIO_SID")
+    token = os.getenv("TWILIO_AUTH_TOKEN")
+    from_number = os.getenv("TWILIO_PHONE_NUMBER")
+
+    if not (sid and token and from_number):
+        for phone in phones:
+            print(f"📱 [DEV MODE] send_sms to {phone}: {message}")
+        return
+
+    client = Client(sid, token)
+    for phone in phones:
+        try:
+            to_num = phone if phone.startswith("+") else f"+91{phone}"
+            client.messages.create(body=message, from_=from_number, to=to_num)
+        except Exception as e:
+            print(f"❌ SMS send error ({phone}): {e}")
+    print(f"✅ SMS sent to {len(phones)} recipients")
+
+def send_sms_batch(phones, message):
+    """Send one message to many numbers from a background thread with a single Twilio client."""
+    phones = [p for p in phones if p]
+    if phones:
+        _sms_executor.submit(_send_sms_many, phones, message)
+
 def send_notification_contacts_for_student(student_id, subject, message):
     """
     Fetch student's email/phone and send the notification via email and/or SMS.
@@ -131,24 +154,134 @@ class Student:
         return [(row[0], row[1] or 0) for row in data] if data else []
 
     @staticmethod
-    def export_csv(student_id):
-        data = Student.get_course_grades(student_id)
-        filename = f"student_{student_id}_report.csv"
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write("Course,Marks\n")
-            for d in data:
-                f.write(f"{d[0]},{d[1]}\n")
-        print(f"📁 Exported report: {filename}")
+    def get_notifications(student_id, limit=NOTIFICATION_PAGE_SIZE, before=None):
+        return Notification.get_for_student(student_id, limit, before)
+
+# ---------------- NOTIFICATION FEEDS ----------------
+# Notifications and TeacherNotifications are read newest first, one page at a
+# time, by keyset on (created_at, id): a page costs the same however long the
+# history is. Unread counts live in NotificationCounters and are kept current
+# by statement-level triggers, so the dashboard badge is a primary-key lookup.
+def _unread_trigger_ddl(table, owner_col, kind):
+    fn = f"{table.lower()}_unread_counter"
+    return f"""
+    CREATE OR REPLACE FUNCTION {fn}() RETURNS trigger LANGUAGE plpgsql AS $fn$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO NotificationCounters (recipient_type, recipient_id, unread)
+            SELECT '{kind}', {owner_col}, COUNT(*) FROM new_rows WHERE read_at IS NULL GROUP BY {owner_col}
+            ON CONFLICT (recipient_type, recipient_id)
+            DO UPDATE SET unread = NotificationCounters.unread + EXCLUDED.unread;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE NotificationCounters c
+            SET unread = GREATEST(c.unread - d.n, 0)
+            FROM (SELECT {owner_col}, COUNT(*) AS n FROM old_rows WHERE read_at IS NULL GROUP BY {owner_col}) d
+            WHERE c.recipient_type = '{kind}' AND c.recipient_id = d.{owner_col};
+        END IF;
+        RETURN NULL;
+    END
+    $fn$;
+    CREATE TRIGGER {fn}_ins AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE {fn}();
+    CREATE TRIGGER {fn}_upd AFTER UPDATE ON {table}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE PROCEDURE {fn}();
+    CREATE TRIGGER {fn}_del AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE PROCEDURE {fn}();
+    """
 
-    @staticmethod
-    def get_notifications(student_id):
-        q = """
-        SELECT message, to_char(created_at,'YYYY-MM-DD HH24:MI')
-        FROM Notifications
-        WHERE student_id=%s
-        ORDER BY created_at DESC
-        """
-        return execute_query(q, (student_id,), fetch=True)
+NOTIFICATION_FEED_DDL = f"""
+DO $do$
+BEGIN
+    IF to_regclass('notificationcounters') IS NULL THEN
+        ALTER TABLE Notifications ADD COLUMN IF NOT EXISTS read_at TIMESTAMP;
+        ALTER TABLE TeacherNotifications ADD COLUMN IF NOT EXISTS read_at TIMESTAMP;
+
+        CREATE TABLE NotificationCounters (
+            recipient_type VARCHAR(10) NOT NULL,
+            recipient_id   INTEGER NOT NULL,
+            unread         INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (recipient_type, recipient_id)
+        );
+        {_unread_trigger_ddl("Notifications", "student_id", "student")}
+        {_unread_trigger_ddl("TeacherNotifications", "teacher_id", "teacher")}
+
+        INSERT INTO NotificationCounters (recipient_type, recipient_id, unread)
+        SELECT 'student', student_id, COUNT(*) FROM Notifications WHERE read_at IS NULL GROUP BY student_id;
+        INSERT INTO NotificationCounters (recipient_type, recipient_id, unread)
+        SELECT 'teacher', teacher_id, COUNT(*) FROM TeacherNotifications WHERE read_at IS NULL GROUP BY teacher_id;
+
+        CREATE INDEX IF NOT EXISTS notifications_student_feed_idx
+            ON Notifications (student_id, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS teachernotifications_teacher_feed_idx
+            ON TeacherNotifications (teacher_id, created_at DESC, id DESC);
+        DROP INDEX IF EXISTS notifications_student_created_idx;
+        DROP INDEX IF EXISTS teachernotifications_teacher_created_idx;
+    END IF;
+END
+$do$;
+"""
+
+def encode_cursor(created_at, notification_id):
+    """Opaque ?before= token for the page that starts after this notification."""
+    return f"{created_at.isoformat()}_{notification_id}"
+
+def decode_cursor(token):
+    """(created_at, id) from encode_cursor(); None (first page) for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        created_at, notification_id = token.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except ValueError:
+        return None
+
+def feed_page_sql(table, owner_col, paged):
+    """The page query _feed_page runs; `paged` adds the (created_at, id) keyset bound."""
+    keyset = "AND (created_at, id) < (%s, %s)" if paged else ""
+    return f"""
+        SELECT message, to_char(created_at,'YYYY-MM-DD HH24:MI'), id, read_at IS NULL, created_at
+        FROM {table}
+        WHERE {owner_col} = %s {keyset}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+    """
+
+UNREAD_COUNT_SQL = "SELECT unread FROM NotificationCounters WHERE recipient_type = %s AND recipient_id = %s"
+
+def _feed_page(cur, table, owner_col, owner_id, limit, before):
+    """
+    One page of `table` for `owner_id`, newest first.
+    Returns (rows, next_cursor); rows are (message, created_at text, id, unread)
+    and next_cursor is None on the last page.
+    """
+    limit = max(1, min(int(limit), 100))
+    cur.execute(feed_page_sql(table, owner_col, before is not None),
+                (owner_id,) + tuple(before or ()) + (limit + 1,))
+    rows = cur.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][4], rows[limit - 1][2]) if len(rows) > limit else None
+    return [r[:4] for r in rows[:limit]], next_cursor
+
+def _unread_count(cur, kind, owner_id):
+    cur.execute(UNREAD_COUNT_SQL, (kind, owner_id))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+def _mark_read(table, owner_col, owner_id, ids=None):
+    """
+    Mark the owner's unread notifications read: only `ids` (the rows actually
+    shown) when given, otherwise all of them. Returns how many changed.
+    """
+    ensure_schema("notification_feed", NOTIFICATION_FEED_DDL)
+    if ids is not None and not ids:
+        return 0
+    with transaction() as cur:
+        cur.execute(f"""
+            UPDATE {table} SET read_at = NOW()
+            WHERE {owner_col} = %s AND read_at IS NULL
+            {"AND id = ANY(%s)" if ids is not None else ""}
+        """, (owner_id,) if ids is None else (owner_id, [int(i) for i in ids]))
+        return cur.rowcount
 
 # ---------------- TEACHER NOTIFICATIONS ----------------
 class TeacherNotification:
@@ -159,17 +292,26 @@ class TeacherNotification:
         return new_id
 
     @staticmethod
-    def get_for_teacher(teacher_id):
-        q = """
-        SELECT message, to_char(created_at,'YYYY-MM-DD HH24:MI')
-        FROM TeacherNotifications
-        WHERE teacher_id=%s
-        ORDER BY created_at DESC
-        """
-        return execute_query(q, (teacher_id,), fetch=True)
+    def get_for_teacher(teacher_id, limit=NOTIFICATION_PAGE_SIZE, before=None):
+        """One page, newest first: (rows, next_cursor). `before` is a cursor from a previous page."""
+        ensure_schema("notification_feed", NOTIFICATION_FEED_DDL)
+        with transaction() as cur:
+            return _feed_page(cur, "TeacherNotifications", "teacher_id", teacher_id, limit, decode_cursor(before))
+
+    @staticmethod
+    def unread_count(teacher_id):
+        ensure_schema("notification_feed", NOTIFICATION_FEED_DDL)
+        with transaction() as cur:
+            return _unread_count(cur, "teacher", teacher_id)
+
+    @staticmethod
+    def mark_read(teacher_id, ids=None):
+        return _mark_read("TeacherNotifications", "teacher_id", teacher_id, ids)
 
 # ---------------- NOTIFICATIONS MODEL ----------------
 class Notification:
+    COURSE_RECIPIENTS_SQL = "SELECT DISTINCT student_id FROM StudentCourses WHERE course_id = %s"
+
     @staticmethod
     def create(student_id, message):
         q = "INSERT INTO Notifications (student_id, message, created_at) VALUES (%s, %s, NOW()) RETURNING id"
@@ -180,16 +322,95 @@ class Notification:
         return new_id
 
     @staticmethod
-    def get_for_student(student_id):
-        q = """
-        SELECT message, to_char(created_at,'YYYY-MM-DD HH24:MI')
-        FROM Notifications
-        WHERE student_id=%s
-        ORDER BY created_at DESC
+    def get_for_student(student_id, limit=NOTIFICATION_PAGE_SIZE, before=None):
+        """One page, newest first: (rows, next_cursor). `before` is a cursor from a previous page."""
+        ensure_schema("notification_feed", NOTIFICATION_FEED_DDL)
+        with transaction() as cur:
+            return _feed_page(cur, "Notifications", "student_id", student_id, limit, decode_cursor(before))
+
+    @staticmethod
+    def unread_count(student_id):
+        ensure_schema("notification_feed", NOTIFICATION_FEED_DDL)
+        with transaction() as cur:
+            return _unread_count(cur, "student", student_id)
+
+    @staticmethod
+    def mark_read(student_id, ids=None):
+        return _mark_read("Notifications", "student_id", student_id, ids)
+
+    @staticmethod
+    def _fan_out(recipients_sql, params, message, subject="Notification from Student Portal"):
+        """
+        Notify every student returned by `recipients_sql` (one student_id column):
+        - one INSERT ... SELECT into Notifications that also returns each recipient's contacts
+        - one multi-row INSERT of their emails into the outbox, in the same transaction
+        - SMS handed to the background batch sender
+        Returns the number of notifications created.
         """
-        return execute_query(q, (student_id,), fetch=True)
+        with transaction() as cur:
+            cur.execute(f"""
+                WITH recipients AS ({recipients_sql}),
+                inserted AS (
+                    INSERT INTO Notifications (student_id, message, created_at)
+                    SELECT student_id, %s, NOW() FROM recipients
+                    RETURNING student_id
+                )
+                SELECT s.id, s.email, s.phone
+                FROM inserted i
+                JOIN Students s ON s.id = i.student_id
+            """, tuple(params) + (message,))
+            contacts = cur.fetchall()
+            if EMAIL_QUEUE_ENABLED:
+                enqueue_emails([(email, subject, message) for _, email, _ in contacts], cur=cur)
+
+        if not EMAIL_QUEUE_ENABLED:
+            for _, email, _ in contacts:
+                if email:
+                    send_email_now(email, subject, message)
+        send_sms_batch([phone for _, _, phone in contacts], message)
+        print(f"🔔 Notification fanned out to {len(contacts)} students: {message}")
+        return len(contacts)
+
+    @staticmethod
+    def create_for_course(course_id, message):
+        """Notify every student enrolled in `course_id`."""
+        return Notification._fan_out(Notification.COURSE_RECIPIENTS_SQL, (course_id,), message)
+
+    @staticmethod
+    def create_for_teacher_students(teacher_id, message):
+        """Notify every student enrolled in any of the teacher's courses (once each)."""
+        return Notification._fan_out("""
+            SELECT DISTINCT sc.student_id
+            FROM StudentCourses sc
+            JOIN TeacherCourses tc ON sc.course_id = tc.course_id
+            WHERE tc.teacher_id = %s
+        """, (teacher_id,), message)
 
 # ---------------- TEACHER MODEL ----------------
+# query helpers take a cursor so the single-purpose methods below and
+# TeacherDashboard.load (one snapshot for the whole page) run the same SQL
+TEACHER_COURSES_SQL = """
+    SELECT c.id, c.course_name
+    FROM Courses c
+    JOIN TeacherCourses tc ON c.id = tc.course_id
+    WHERE tc.teacher_id = %s
+"""
+
+TEACHER_POSTS_SQL = """
+    SELECT id, message, to_char(created_at,'YYYY-MM-DD HH24:MI')
+    FROM TeacherPosts
+    WHERE teacher_id = %s
+    ORDER BY created_at DESC
+"""
+
+def _teacher_courses(cur, teacher_id):
+    cur.execute(TEACHER_COURSES_SQL, (teacher_id,))
+    return cur.fetchall()
+
+def _teacher_posts(cur, teacher_id):
+    cur.execute(TEACHER_POSTS_SQL, (teacher_id,))
+    return cur.fetchall()
+
 class Teacher:
     @staticmethod
     def register(name, password):
@@ -200,11 +421,8 @@ class Teacher:
 
     @staticmethod
     def get_courses(teacher_id):
-        q = """SELECT c.id, c.course_name
-               FROM Courses c
-               JOIN TeacherCourses tc ON c.id = tc.course_id
-               WHERE tc.teacher_id = %s"""
-        return execute_query(q, (teacher_id,), fetch=True)
+        with transaction() as cur:
+            return _teacher_courses(cur, teacher_id)
 
     @staticmethod
     def login(teacher_id, password):
@@ -268,26 +486,14 @@ class TeacherPost:
         )
 
         # ALSO notify all students of this teacher
-        students = execute_query("""
-            SELECT DISTINCT sc.student_id
-            FROM StudentCourses sc
-            JOIN TeacherCourses tc ON sc.course_id = tc.course_id
-            WHERE tc.teacher_id = %s
-        """, (teacher_id,), fetch=True)
-
-        for (sid,) in students or []:
-            Notification.create(sid, f"📢 Announcement from your teacher: {message}")
+        Notification.create_for_teacher_students(teacher_id, f"📢 Announcement from your teacher: {message}")
 
         return post_id
 
     @staticmethod
     def get_for_teacher(teacher_id):
-        return execute_query("""
-            SELECT id, message, to_char(created_at,'YYYY-MM-DD HH24:MI')
-            FROM TeacherPosts
-            WHERE teacher_id = %s
-            ORDER BY created_at DESC
-        """, (teacher_id,), fetch=True)
+        with transaction() as cur:
+            return _teacher_posts(cur, teacher_id)
 
 # ---------------- ADMIN MODEL ----------------
 class Admin:
@@ -299,11 +505,17 @@ class Admin:
 
     @staticmethod
     def show_all_students():
-        q = "SELECT id, name, grades FROM Students"
-        return execute_query(q, fetch=True)
+        """
+        List of (id, name, grades) for the admin page. Materialised on purpose: a
+        streaming iterator would pin a pooled connection until its consumer
+        finished or was garbage-collected. Bulk exports go through exports.py.
+        """
+        return execute_query("SELECT id, name, grades FROM Students ORDER BY id", fetch=True) or []
 
 # ---------------- OTP MODEL ----------------
 class OTP:
+    LATEST_SQL = "SELECT otp_code, expires_at FROM OTP_CODES WHERE student_id=%s ORDER BY expires_at DESC LIMIT 1"
+
     @staticmethod
     def generate_otp(student_id):
         otp = str(random.randint(100000, 999999))
@@ -315,8 +527,7 @@ class OTP:
 
     @staticmethod
     def verify_otp(student_id, otp_code):
-        q = "SELECT otp_code, expires_at FROM OTP_CODES WHERE student_id=%s ORDER BY expires_at DESC LIMIT 1"
-        data = execute_query(q, (student_id,), fetch=True)
+        data = execute_query(OTP.LATEST_SQL, (student_id,), fetch=True)
         if not data:
             return False
         otp, expiry = data[0]
@@ -332,10 +543,7 @@ class Assignment:
         """
         new_id = execute_query(q, (course_id, teacher_id, title, description, due_date), returning=True)
         # notify students in the course
-        students = execute_query("SELECT student_id FROM StudentCourses WHERE course_id=%s", (course_id,), fetch=True)
-        if students:
-            for (sid,) in students:
-                Notification.create(sid, f"🆕 New assignment posted: {title} (Due: {due_date})")
+        Notification.create_for_course(course_id, f"🆕 New assignment posted: {title} (Due: {due_date})")
         print(f"✅ Assignment {new_id} created for Course {course_id}")
         return new_id
 
@@ -346,13 +554,31 @@ class Assignment:
 
 # ---------------- SUBMISSIONS MODEL ----------------
 class Submission:
+    # content-addressed uploads (storage.py): file_path is the path under the
+    # upload folder, file_name what the student called it. The columns come
+    # from migration 9 (SUBMISSION_STORAGE_DDL in migrations.py).
+    FOR_ASSIGNMENT_SQL = """
+    SELECT s.id, st.name, s.file_path, s.submitted_at, s.marks, s.file_name
+    FROM Submissions s
+    JOIN Students st ON s.student_id = st.id
+    WHERE s.assignment_id=%s
+    """
+
+    FOR_STUDENT_SQL = """
+    SELECT s.id, a.id, a.title, s.file_path, s.submitted_at, s.marks
+    FROM Submissions s
+    JOIN Assignments a ON s.assignment_id = a.id
+    WHERE s.student_id = %s
+    """
+
     @staticmethod
-    def submit(assignment_id, student_id, file_path):
+    def submit(assignment_id, student_id, file_path, file_name=None, file_sha256=None, file_size=None):
         q = """
-        INSERT INTO Submissions (assignment_id, student_id, file_path, submitted_at)
-        VALUES (%s, %s, %s, NOW()) RETURNING id
+        INSERT INTO Submissions (assignment_id, student_id, file_path, file_name, file_sha256, file_size, submitted_at)
+        VALUES (%s, %s, %s, %s, %s, %s, NOW()) RETURNING id
         """
-        new_id = execute_query(q, (assignment_id, student_id, file_path), returning=True)
+        new_id = execute_query(q, (assignment_id, student_id, file_path, file_name or file_path,
+                                   file_sha256, file_size), returning=True)
 
         # notify student (confirmation)
         Notification.create(student_id, f"📤 Assignment {assignment_id} submitted successfully.")
@@ -366,89 +592,304 @@ class Submission:
 
         return new_id
 
+    @staticmethod
+    def get_for_assignment(assignment_id):
+        return execute_query(Submission.FOR_ASSIGNMENT_SQL, (assignment_id,), fetch=True)
+
     @staticmethod
     def get_for_student(student_id):
-        q = """
-        SELECT s.id, a.id, a.title, s.file_path, s.submitted_at, s.marks
-        FROM Submissions s
-        JOIN Assignments a ON s.assignment_id = a.id
-        WHERE s.student_id = %s
-        """
-        return execute_query(q, (student_id,), fetch=True)
+        return execute_query(Submission.FOR_STUDENT_SQL, (student_id,), fetch=True)
 
 # ---------------- ATTENDANCE MODEL ----------------
 class AttendanceModel:
     @staticmethod
     def mark_attendance_bulk(course_id, date_str, attendance_list):
-        for rec in attendance_list:
-            sid = rec['student_id']
-            present = 1 if rec.get('present') else 0
-
-            # Was this date already marked?
-            exists = execute_query(
-                "SELECT id FROM Attendance WHERE student_id=%s AND course_id=%s AND DATE(date_marked)=%s",
-                (sid, course_id, date_str), fetch=True
-            )
-
-            if exists:
-                # Update only if needed
-                execute_query(
-                    "UPDATE Attendance SET present=%s, created_at=NOW() WHERE id=%s",
-                    (present, exists[0][0])
-                )
-            else:
-                # New entry
-                execute_query(
-                    "INSERT INTO Attendance (student_id, course_id, date_marked, present, created_at) "
-                    "VALUES (%s,%s,%s,%s,NOW())",
-                    (sid, course_id, date_str, present)
-                )
+        """
+        Write a whole class sheet with one INSERT ... ON CONFLICT in one transaction,
+        refreshing the attendance rollup alongside.
+        Returns {"inserted": n, "updated": m}.
+        """
+        # last entry wins if a student appears twice on the sheet
+        sheet = {int(rec['student_id']): (1 if rec.get('present') else 0) for rec in attendance_list}
+        if not sheet:
+            return {"inserted": 0, "updated": 0}
+
+        # ON CONFLICT needs attendance_student_course_date_uq (migration 3, `python migrations.py upgrade`)
+        AttendanceRollup.ensure()
+        with transaction() as cur:
+            flags = execute_values(cur, """
+                INSERT INTO Attendance (student_id, course_id, date_marked, present, created_at)
+                VALUES %s
+                ON CONFLICT (student_id, course_id, date_marked) DO UPDATE
+                SET present = EXCLUDED.present, created_at = NOW()
+                RETURNING (xmax = 0)
+            """, [(sid, course_id, date_str, present) for sid, present in sheet.items()],
+                template="(%s, %s, %s::date, %s, NOW())", page_size=len(sheet), fetch=True)
+            AttendanceRollup.refresh(course_id, date_str, list(sheet), cur=cur)
+
+        inserted = sum(1 for (is_new,) in flags if is_new)
+        return {"inserted": inserted, "updated": len(flags) - inserted}
 
     @staticmethod
     def get_attendance_percentage(student_id, course_id, lookback_days=180):
         cutoff = (datetime.now() - timedelta(days=int(lookback_days))).date()
+        return AttendanceRollup.percent(student_id, course_id=course_id, since=cutoff)
+
+    # the per-day class sheet: one course, one day, every enrolled student;
+    # served by attendance_course_date_student_idx (migration 4)
+    SHEET_SQL = """
+    SELECT
+        s.id,
+        s.name,
+        COALESCE(a.present, 0) AS present,
+        a.id AS record_exists
+    FROM StudentCourses sc
+    JOIN Students s ON s.id = sc.student_id
+    LEFT JOIN Attendance a
+           ON a.course_id = sc.course_id
+          AND a.student_id = sc.student_id
+          AND a.date_marked >= %s::date
+          AND a.date_marked < %s::date + 1
+    WHERE sc.course_id = %s
+    ORDER BY s.name
+    """
+
+    @staticmethod
+    def get_course_attendance_for_date(course_id, date_str):
+        """
+        (student_id, name, present, attendance_id or None) for every student in
+        the course on `date_str`. The day is matched as a half-open range so the
+        (course_id, date_marked, student_id) index can be used.
+        """
+        return execute_query(
+            AttendanceModel.SHEET_SQL,
+            (date_str, date_str, course_id),
+            fetch=True
+        )
+
+# ---------------- ATTENDANCE ROLLUP ----------------
+class AttendanceRollup:
+    """
+    Per (student, course, day) present/total counts derived from Attendance.
+    Windowed attendance percentages become a range sum over this table
+    instead of an aggregate over raw Attendance rows.
+    """
+
+    DDL = """
+    DO $$
+    BEGIN
+        IF to_regclass('attendancedaily') IS NULL THEN
+            CREATE TABLE AttendanceDaily (
+                student_id    INTEGER NOT NULL,
+                course_id     INTEGER NOT NULL,
+                day           DATE NOT NULL,
+                present_count INTEGER NOT NULL,
+                total_count   INTEGER NOT NULL,
+                PRIMARY KEY (student_id, course_id, day)
+            );
+            CREATE INDEX attendancedaily_student_day_idx ON AttendanceDaily (student_id, day);
+            CREATE INDEX attendancedaily_course_day_idx ON AttendanceDaily (course_id, day);
+            INSERT INTO AttendanceDaily (student_id, course_id, day, present_count, total_count)
+            SELECT student_id, course_id, DATE(date_marked), COALESCE(SUM(present), 0), COUNT(*)
+            FROM Attendance
+            GROUP BY student_id, course_id, DATE(date_marked);
+        END IF;
+    END $$;
+    """
+
+    @staticmethod
+    def ensure():
+        ensure_schema("attendance_rollup", AttendanceRollup.DDL)
+
+    @staticmethod
+    def refresh(course_id, day, student_ids, cur=None):
+        """
+        Recompute the rollup rows of `student_ids` for one course/day from Attendance.
+        Pass `cur` to run inside the caller's transaction.
+        """
+        if not student_ids:
+            return
+        AttendanceRollup.ensure()
+        q = """
+            INSERT INTO AttendanceDaily (student_id, course_id, day, present_count, total_count)
+            SELECT student_id, course_id, %s::date, COALESCE(SUM(present), 0), COUNT(*)
+            FROM Attendance
+            WHERE course_id = %s
+              AND student_id = ANY(%s)
+              AND date_marked >= %s::date
+              AND date_marked < %s::date + 1
+            GROUP BY student_id, course_id
+            ON CONFLICT (student_id, course_id, day) DO UPDATE
+            SET present_count = EXCLUDED.present_count,
+                total_count = EXCLUDED.total_count
+        """
+        params = (day, course_id, [int(s) for s in student_ids], day, day)
+        if cur is None:
+            execute_query(q, params)
+        else:
+            cur.execute(q, params)
+
+    @staticmethod
+    def rebuild(student_ids=None):
+        """
+        Backfill the rollup from Attendance (everything, or only `student_ids`).
+        The clear and the refill commit together: readers never see the rollup
+        empty (a full rebuild's TRUNCATE makes them wait for the new rows instead).
+        """
+        AttendanceRollup.ensure()
+        with transaction() as cur:
+            if student_ids is None:
+                cur.execute("TRUNCATE AttendanceDaily")
+                where, params = "", None
+            else:
+                ids = [int(s) for s in student_ids]
+                cur.execute("DELETE FROM AttendanceDaily WHERE student_id = ANY(%s)", (ids,))
+                where, params = "WHERE student_id = ANY(%s)", (ids,)
+            cur.execute(f"""
+                INSERT INTO AttendanceDaily (student_id, course_id, day, present_count, total_count)
+                SELECT student_id, course_id, DATE(date_marked), COALESCE(SUM(present), 0), COUNT(*)
+                FROM Attendance
+                {where}
+                GROUP BY student_id, course_id, DATE(date_marked)
+            """, params)
+
+    @staticmethod
+    def percent_query(student_id, course_id=None, since=None):
+        """(sql, params) for percent(): present / total counts over the rollup."""
         q = """
-        SELECT COALESCE(SUM(present),0), COUNT(*)
-        FROM Attendance
-        WHERE student_id=%s AND course_id=%s AND date_marked >= %s
+        SELECT COALESCE(SUM(present_count), 0), COALESCE(SUM(total_count), 0)
+        FROM AttendanceDaily
+        WHERE student_id=%s
         """
-        data = execute_query(q, (student_id, course_id, cutoff), fetch=True)
+        params = [student_id]
+        if course_id is not None:
+            q += " AND course_id=%s"
+            params.append(course_id)
+        if since is not None:
+            q += " AND day >= %s"
+            params.append(since)
+        return q, tuple(params)
+
+    @staticmethod
+    def percent(student_id, course_id=None, since=None):
+        """Attendance percent (0..100, 2 decimals) over days >= `since`, optionally for one course."""
+        AttendanceRollup.ensure()
+        data = execute_query(*AttendanceRollup.percent_query(student_id, course_id, since), fetch=True)
         if not data:
             return 0.0
-        s, cnt = data[0]
-        if cnt == 0:
+        present, total = data[0]
+        if not total:
             return 0.0
-        return round((s or 0) / cnt * 100, 2)
+        return round(present / total * 100, 2)
+
+# ---------------- STUDENT DASHBOARD ----------------
+class StudentDashboard:
+    @staticmethod
+    def load(student_id):
+        """Everything the student dashboard renders, keyed by template variable."""
+        assignments = execute_query("""
+            SELECT
+                a.id, a.title, a.due_date,
+                s.file_path, s.marks
+            FROM Assignments a
+            JOIN StudentCourses sc ON a.course_id = sc.course_id
+            LEFT JOIN Submissions s ON s.assignment_id = a.id AND s.student_id = %s
+            WHERE sc.student_id = %s
+            ORDER BY a.due_date
+        """, (student_id, student_id), fetch=True)
+
+        grades = Student.get_course_grades(student_id)
+        notifications, next_cursor = Notification.get_for_student(student_id)
+        return {
+            "student": Student.get_details(student_id),
+            "courses": Student.show_courses(student_id),
+            "assignments": assignments,
+            "notifications": notifications,
+            "notifications_next": next_cursor,
+            "unread_notifications": Notification.unread_count(student_id),
+            "chart_labels": [g[0] for g in grades],
+            "chart_data": [float(g[1]) for g in grades],
+        }
+
+# ---------------- TEACHER DASHBOARD ----------------
+class TeacherDashboard:
+    ASSIGNMENTS_SQL = """
+    SELECT id, title, due_date
+    FROM Assignments
+    WHERE teacher_id = %s
+    ORDER BY due_date DESC
+    """
+
+    # per-student attendance percent across all of the teacher's courses
+    ATTENDANCE_SQL = """
+    SELECT a.course_id, s.name,
+           ROUND(SUM(a.present_count)::numeric / NULLIF(SUM(a.total_count), 0) * 100, 2)
+    FROM AttendanceDaily a
+    JOIN Students s ON a.student_id = s.id
+    WHERE a.course_id IN (SELECT course_id FROM TeacherCourses WHERE teacher_id = %s)
+      AND a.day >= %s
+    GROUP BY a.course_id, s.id, s.name
+    ORDER BY a.course_id, s.name
+    """
 
     @staticmethod
-    def get_course_attendance_for_date(course_id, date_str):
-        q = """
-        SELECT 
-            s.id, 
-            s.name,
-            COALESCE((
-                SELECT present 
-                FROM Attendance a 
-                WHERE a.student_id = s.id 
-                  AND a.course_id = %s 
-                  AND DATE(a.date_marked) = %s 
-                LIMIT 1
-            ), 0) AS present,
-            (
-                SELECT id 
-                FROM Attendance a 
-                WHERE a.student_id = s.id 
-                  AND a.course_id = %s 
-                  AND DATE(a.date_marked) = %s 
-                LIMIT 1
-            ) AS record_exists
-        FROM Students s
-        JOIN StudentCourses sc ON s.id = sc.student_id
-        WHERE sc.course_id = %s
-        ORDER BY s.name
+    def load(teacher_id, attendance_days=DASHBOARD_ATTENDANCE_DAYS):
         """
-        return execute_query(
-            q, 
-            (course_id, date_str, course_id, date_str, course_id), 
-            fetch=True
-        )
+        Everything the teacher dashboard shows (except the risk list), read on
+        one connection inside one read-only snapshot. The attendance summary
+        for all of the teacher's courses is a single grouped query over the
+        rollup, limited to the last `attendance_days` days.
+        """
+        AttendanceRollup.ensure()
+        ensure_schema("notification_feed", NOTIFICATION_FEED_DDL)
+        cutoff = (datetime.now() - timedelta(days=int(attendance_days))).date()
+
+        with transaction(snapshot=True) as cur:
+            cur.execute("SELECT id, name FROM Teachers WHERE id=%s", (teacher_id,))
+            teacher = cur.fetchone()
+
+            cur.execute("""
+                SELECT s.id, s.name, c.course_name, c.id
+                FROM Students s
+                JOIN StudentCourses sc ON s.id = sc.student_id
+                JOIN Courses c ON sc.course_id = c.id
+                JOIN TeacherCourses tc ON c.id = tc.course_id
+                WHERE tc.teacher_id = %s
+            """, (teacher_id,))
+            students = cur.fetchall()
+
+            courses = _teacher_courses(cur, teacher_id)
+
+            cur.execute(TeacherDashboard.ASSIGNMENTS_SQL, (teacher_id,))
+            assignments = cur.fetchall()
+
+            posts = _teacher_posts(cur, teacher_id)
+
+            # same page / counter helpers as TeacherNotification.get_for_teacher / unread_count
+            notifications, notifications_next = _feed_page(
+                cur, "TeacherNotifications", "teacher_id", teacher_id, NOTIFICATION_PAGE_SIZE, None)
+            unread_notifications = _unread_count(cur, "teacher", teacher_id)
+
+            cur.execute(TeacherDashboard.ATTENDANCE_SQL, (teacher_id, cutoff))
+            attendance_rows = cur.fetchall()
+
+        records_by_course = {}
+        for cid, name, percent in attendance_rows:
+            records_by_course.setdefault(cid, []).append({'name': name, 'percent': float(percent or 0)})
+
+        attendance_summary = [
+            {'course_id': cid, 'course_name': cname, 'records': records_by_course.get(cid, [])}
+            for cid, cname in courses
+        ]
+
+        return {
+            "teacher": teacher,
+            "students": students,
+            "courses": courses,
+            "assignments": assignments,
+            "posts": posts,
+            "notifications": notifications,
+            "notifications_next": notifications_next,
+            "unread_notifications": unread_notifications,
+            "attendance_summary": attendance_summary,
+        }
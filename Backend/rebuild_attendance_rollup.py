@@ -0,0 +1,9 @@
+from models import AttendanceRollup
+
+# Backfill AttendanceDaily from the raw Attendance table.
+# Safe to re-run; it replaces the whole rollup.
+print("🔄 Rebuilding attendance rollup...")
+
+AttendanceRollup.rebuild()
+
+print("✅ Done.")
@@ -0,0 +1,9 @@
+from ml_model import refresh_risk_snapshot
+
+# Rescore every student and refresh the StudentRiskLatest snapshot read by the
+# teacher dashboard. Run it from cron; it does not send notifications.
+print("🔄 Rescoring students...")
+
+results = refresh_risk_snapshot()
+
+print(f"✅ Done. {len(results)} students scored.")
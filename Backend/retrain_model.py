@@ -0,0 +1,21 @@
+import sys
+from ml_model import train_and_save_model, export_model_artifact
+
+# Retrain the risk model. From cron, `--incremental` only trains on students
+# whose marks or attendance changed since the saved model's watermark; run a
+# full refit now and then (the 90-day attendance window also moves by itself).
+# Every run also writes models/risk_model.npz, the NumPy artifact the web app scores with.
+#   python retrain_model.py                      full refit (LogisticRegression)
+#   python retrain_model.py --incremental        SGD partial_fit on changed students
+#   python retrain_model.py --export-artifact    only re-export the artifact from the saved pipeline
+if "--export-artifact" in sys.argv[1:]:
+    model = export_model_artifact()
+    print("✅ Done." if model is not None else "❌ No saved pipeline to export.")
+    sys.exit(0 if model is not None else 1)
+
+incremental = "--incremental" in sys.argv[1:]
+print(f"🔄 {'Incremental' if incremental else 'Full'} retraining...")
+
+model = train_and_save_model(incremental=incremental)
+
+print("✅ Done." if model is not None else "❌ Training failed.")
@@ -0,0 +1,231 @@
+# seed_data.py (synthetic data for load testing)
+#
+# Generates students, enrollments + marks, attendance, assignments and
+# submissions with NumPy and streams them into Postgres with COPY.
+#
+#   python seed_data.py --scale 10 --seed 42          # 10k students
+#   python seed_data.py --students 100000 --days 90
+#
+# Rows are appended after the current max ids, so it can run against a
+# database that already has data. Run `python migrations.py` first.
+import io
+import time
+import argparse
+from contextlib import nullcontext
+from datetime import date, timedelta
+import numpy as np
+
+from db import execute_query, transaction
+from models import AttendanceRollup
+
+STUDENTS_PER_SCALE = 1000
+CHUNK_STUDENTS = 2000           # attendance/submission rows are generated this many students at a time
+
+def _max_id(table):
+    return execute_query(f"SELECT COALESCE(MAX(id), 0) FROM {table}", fetch=True)[0][0]
+
+def _sync_sequence(cur, table):
+    cur.execute(f"SELECT setval(pg_get_serial_sequence('{table.lower()}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {table}))")
+
+def _copy(cur, table, columns, rows):
+    """COPY an iterable of row tuples (already str-able) into `table`."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join(row))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+def _na(values, mask):
+    """Format floats as text, with COPY's \\N where mask is True."""
+    text = np.char.mod("%.2f", values)
+    return np.where(mask, "\\N", text)
+
+def _drop_attendance_indexes(cur):
+    """
+    Drop Attendance's secondary indexes and foreign keys for the bulk load.
+    Returns what is needed to put them back; per-row index and FK upkeep
+    is most of the cost of a large COPY into this table. Runs on the load's
+    own transaction (see seed()), so the drops only ever commit together
+    with the rebuild.
+    """
+    cur.execute("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE tablename = 'attendance' AND indexname <> 'attendance_pkey'
+    """)
+    indexes = cur.fetchall()
+    cur.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'attendance'::regclass AND contype = 'f'
+    """)
+    fkeys = cur.fetchall()
+    for name, _ in fkeys:
+        cur.execute(f"ALTER TABLE Attendance DROP CONSTRAINT {name}")
+    for name, _ in indexes:
+        cur.execute(f"DROP INDEX {name}")
+    return indexes, fkeys
+
+def _restore_attendance_indexes(cur, indexes, fkeys):
+    for _, indexdef in indexes:
+        cur.execute(indexdef)
+    for name, condef in fkeys:
+        cur.execute(f"ALTER TABLE Attendance ADD CONSTRAINT {name} {condef}")
+
+def seed(n_students, n_courses=6, days=90, assignments_per_course=4, seed=42, defer_indexes=False):
+    rng = np.random.default_rng(seed)
+    timings = {}
+
+    # ---------------- courses + teachers ----------------
+    start = time.time()
+    courses = [r[0] for r in execute_query("SELECT id FROM Courses ORDER BY id LIMIT %s", (n_courses,), fetch=True) or []]
+    with transaction() as cur:
+        for k in range(len(courses), n_courses):
+            cur.execute("INSERT INTO Courses (course_name) VALUES (%s) RETURNING id", (f"Seed Course {k + 1}",))
+            courses.append(cur.fetchone()[0])
+        teacher_ids = []
+        for cid in courses:
+            cur.execute("INSERT INTO Teachers (name, password) VALUES (%s, 'seed') RETURNING id", (f"Seed Teacher {cid}",))
+            teacher_ids.append(cur.fetchone()[0])
+        _copy(cur, "TeacherCourses", ["teacher_id", "course_id"],
+              ((str(t), str(c)) for t, c in zip(teacher_ids, courses)))
+    course_ids = np.array(courses, dtype=np.int64)
+    timings["courses"] = time.time() - start
+
+    # ---------------- students ----------------
+    start = time.time()
+    first_id = _max_id("Students") + 1
+    student_ids = np.arange(first_id, first_id + n_students, dtype=np.int64)
+    sid_text = student_ids.astype(str)
+    with transaction() as cur:
+        _copy(cur, "Students", ["id", "name", "email", "phone", "password", "parent_email"], (
+            (s, f"Student {s}", f"student{s}@example.com", "\\N", "seed", f"parent{s}@example.com")
+            for s in sid_text
+        ))
+        _sync_sequence(cur, "Students")
+    timings["students"] = time.time() - start
+
+    # per-student ability and attendance propensity drive everything below
+    ability = np.clip(rng.normal(60, 15, n_students), 5, 98)
+    attend_p = rng.beta(8, 2, n_students)
+
+    # ---------------- enrollments + marks ----------------
+    start = time.time()
+    marks = np.clip(ability[:, None] + rng.normal(0, 12, (n_students, len(course_ids))), 0, 100)
+    missing = rng.random(marks.shape) < 0.05
+    with transaction() as cur:
+        _copy(cur, "StudentCourses", ["student_id", "course_id", "marks"], zip(
+            np.repeat(sid_text, len(course_ids)),
+            np.tile(course_ids.astype(str), n_students),
+            _na(marks.ravel(), missing.ravel()),
+        ))
+    timings["enrollments"] = time.time() - start
+
+    # ---------------- assignments ----------------
+    start = time.time()
+    today = date.today()
+    first_assignment = _max_id("Assignments") + 1
+    n_assignments = len(course_ids) * assignments_per_course
+    assignment_ids = np.arange(first_assignment, first_assignment + n_assignments, dtype=np.int64)
+    assignment_course = np.repeat(course_ids, assignments_per_course)
+    assignment_teacher = np.repeat(np.array(teacher_ids, dtype=np.int64), assignments_per_course)
+    due_offsets = rng.integers(-days, 14, n_assignments)
+    with transaction() as cur:
+        _copy(cur, "Assignments", ["id", "course_id", "teacher_id", "title", "description", "due_date"], (
+            (str(a), str(c), str(t), f"Seed assignment {a}", "\\N", (today + timedelta(days=int(d))).isoformat())
+            for a, c, t, d in zip(assignment_ids, assignment_course, assignment_teacher, due_offsets)
+        ))
+        _sync_sequence(cur, "Assignments")
+    timings["assignments"] = time.time() - start
+
+    # ---------------- attendance + submissions, chunked by student ----------------
+    day_text = np.array([(today - timedelta(days=d)).isoformat() for d in range(days)])
+    chunk_args = (rng, n_students, student_ids, sid_text, ability, attend_p, course_ids,
+                  day_text, assignment_ids, n_assignments, today, timings)
+    if defer_indexes:
+        # drop, load and rebuild in ONE transaction: DDL is transactional in Postgres, so if the
+        # process dies mid-load everything rolls back and Attendance keeps its indexes and FKs
+        with transaction() as cur:
+            deferred = _drop_attendance_indexes(cur)
+            _seed_chunks(*chunk_args, cur=cur)
+            start = time.time()
+            _restore_attendance_indexes(cur, *deferred)
+            timings["reindex"] = time.time() - start
+    else:
+        _seed_chunks(*chunk_args)
+
+    # ---------------- derived tables + statistics ----------------
+    start = time.time()
+    AttendanceRollup.rebuild(student_ids.tolist())
+    execute_query("ANALYZE")
+    timings["rollup+analyze"] = time.time() - start
+    return timings
+
+def _seed_chunks(rng, n_students, student_ids, sid_text, ability, attend_p, course_ids,
+                 day_text, assignment_ids, n_assignments, today, timings, cur=None):
+    """
+    Attendance and submissions, generated and COPYed CHUNK_STUDENTS students at a time.
+    Each chunk commits on its own, unless `cur` is given: then everything runs in that transaction.
+    """
+    def chunk_tx():
+        return nullcontext(cur) if cur is not None else transaction()
+
+    days = len(day_text)
+    n_c = len(course_ids)
+    attendance_s = submissions_s = 0.0
+    for lo in range(0, n_students, CHUNK_STUDENTS):
+        hi = min(lo + CHUNK_STUDENTS, n_students)
+        n = hi - lo
+
+        start = time.time()
+        present = (rng.random((n, n_c, days)) < attend_p[lo:hi, None, None]).astype(np.int8)
+        with chunk_tx() as c:
+            _copy(c, "Attendance", ["student_id", "course_id", "date_marked", "present"], zip(
+                np.repeat(sid_text[lo:hi], n_c * days),
+                np.tile(np.repeat(course_ids.astype(str), days), n),
+                np.tile(day_text, n * n_c),
+                present.ravel().astype(str),
+            ))
+        attendance_s += time.time() - start
+
+        start = time.time()
+        submitted = rng.random((n, n_assignments)) < 0.8
+        sub_marks = np.clip(ability[lo:hi, None] + rng.normal(0, 10, (n, n_assignments)), 0, 100)
+        ungraded = rng.random((n, n_assignments)) < 0.2
+        rows_s, rows_a = np.nonzero(submitted)
+        with chunk_tx() as c:
+            _copy(c, "Submissions", ["assignment_id", "student_id", "file_path", "submitted_at", "marks"], zip(
+                assignment_ids[rows_a].astype(str),
+                sid_text[lo:hi][rows_s],
+                np.char.add(np.char.add("seed/", assignment_ids[rows_a].astype(str)), ".pdf"),
+                np.full(len(rows_s), today.isoformat()),
+                _na(sub_marks[rows_s, rows_a], ungraded[rows_s, rows_a]),
+            ))
+        submissions_s += time.time() - start
+        print(f"  … {hi}/{n_students} students")
+
+    timings["attendance"] = attendance_s
+    timings["submissions"] = submissions_s
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed synthetic students, marks, attendance and submissions.")
+    parser.add_argument("--scale", type=float, default=1.0, help=f"{STUDENTS_PER_SCALE} students per unit")
+    parser.add_argument("--students", type=int, help="exact student count (overrides --scale)")
+    parser.add_argument("--courses", type=int, default=6)
+    parser.add_argument("--days", type=int, default=90, help="days of attendance history")
+    parser.add_argument("--assignments", type=int, default=4, help="assignments per course")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop Attendance indexes/foreign keys during the load and rebuild them after, "
+                             "all in one transaction")
+    args = parser.parse_args()
+
+    n = args.students if args.students is not None else int(args.scale * STUDENTS_PER_SCALE)
+    print(f"🌱 Seeding {n} students × {args.courses} courses × {args.days} days (seed={args.seed})...")
+    t0 = time.time()
+    timings = seed(n, n_courses=args.courses, days=args.days,
+                   assignments_per_course=args.assignments, seed=args.seed,
+                   defer_indexes=args.defer_indexes)
+    for stage, secs in timings.items():
+        print(f"  {stage:<15} {secs:8.2f}s")
+    print(f"✅ Done in {time.time() - t0:.2f}s")
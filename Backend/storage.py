@@ -0,0 +1,156 @@
+# storage.py (content-addressed storage for submission uploads)
+#
+# Uploads are written in chunks to a temp file under <root>/.tmp while being
+# hashed, then moved to <root>/<sha[:2]>/<sha[2:4]>/<sha256>. Identical
+# files are kept once, and two students uploading "report.pdf" no longer
+# overwrite each other; the original file name lives in Submissions.file_name.
+#
+# app.py plugs spool() into Werkzeug's multipart parser, so the bytes hit
+# disk exactly once -- hashed and size-checked as the request body is read.
+#
+# Downloads (download_response) carry the SHA-256 as a strong ETag, answer
+# conditional and Range requests, and can hand the bytes to a front proxy:
+#   DOWNLOAD_OFFLOAD=x-accel     nginx, with an `internal` location at DOWNLOAD_ACCEL_PREFIX
+#                                aliased to the upload folder
+#   DOWNLOAD_OFFLOAD=x-sendfile  Apache mod_xsendfile / lighttpd
+import os
+import re
+import hashlib
+import tempfile
+import mimetypes
+from flask import Response, request, send_from_directory
+from werkzeug.exceptions import RequestEntityTooLarge, NotFound
+from werkzeug.security import safe_join
+
+UPLOAD_MAX_BYTES = int(float(os.getenv("UPLOAD_MAX_MB", 50)) * 1024 * 1024)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "").lower()              # "", "x-accel" or "x-sendfile"
+DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/protected-uploads/")
+DOWNLOAD_MAX_AGE = int(os.getenv("DOWNLOAD_MAX_AGE", 86400))              # content-addressed files never change
+
+_CONTENT_PATH = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})$")
+
+class UploadTooLarge(RequestEntityTooLarge):
+    description = "The uploaded file is larger than the configured maximum."
+
+class HashingFile:
+    """
+    Writable temp file that keeps a running SHA-256 and byte count, and
+    refuses to grow past `max_bytes`. Deleted on close() unless commit()ed.
+    """
+
+    def __init__(self, tmp_dir, max_bytes=UPLOAD_MAX_BYTES):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=tmp_dir, prefix="upload_", delete=False)
+        self.name = self._file.name
+        self.max_bytes = max_bytes
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.close()            # the parser drops us on error; don't leave the partial file behind
+            raise UploadTooLarge()
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, attr):
+        # read / readline / seek / tell / flush ... for Werkzeug's FileStorage
+        return getattr(self._file, attr)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed and os.path.exists(self.name):
+            os.remove(self.name)
+
+def spool(root, max_bytes=UPLOAD_MAX_BYTES):
+    return HashingFile(os.path.join(root, ".tmp"), max_bytes)
+
+def relative_path(sha256_hex):
+    return os.path.join(sha256_hex[:2], sha256_hex[2:4], sha256_hex)
+
+def commit(root, hf):
+    """Move a fully written HashingFile into place. Returns (sha256, size, relative path)."""
+    digest = hf.sha256.hexdigest()
+    rel = relative_path(digest)
+    target = os.path.join(root, rel)
+    hf.flush()
+    os.fsync(hf.fileno())
+    hf._file.close()
+    if os.path.exists(target):
+        os.remove(hf.name)              # already stored: keep the one copy
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(hf.name, target)
+    hf.committed = True
+    return digest, hf.size, rel
+
+def store(root, stream, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Store an upload. `stream` is either the HashingFile spool() created while
+    the request was parsed, or any readable binary stream, which is copied in
+    UPLOAD_CHUNK_SIZE chunks. Returns (sha256, size, relative path).
+    """
+    if isinstance(stream, HashingFile):
+        return commit(root, stream)
+    hf = spool(root, max_bytes)
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hf.write(chunk)
+        return commit(root, hf)
+    finally:
+        hf.close()
+
+# ---------------- DOWNLOADS ----------------
+def download_response(root, rel_path, download_name=None):
+    """
+    Serve `rel_path` under `root` as an attachment.
+    Content-addressed files get their SHA-256 as a strong ETag and a private
+    max-age (the bytes behind a hash path never change); files from before
+    content addressing fall back to an mtime/size ETag and revalidate every
+    time. Conditional requests get 304; Range requests get 206 here, or from
+    the proxy when DOWNLOAD_OFFLOAD is set.
+    """
+    match = _CONTENT_PATH.match(rel_path)
+    digest = match.group(1) if match else None
+    download_name = download_name or os.path.basename(rel_path)
+
+    if DOWNLOAD_OFFLOAD in ("x-accel", "x-sendfile"):
+        rv = _offload_response(root, rel_path, download_name, digest)
+    else:
+        rv = send_from_directory(root, rel_path, as_attachment=True, download_name=download_name,
+                                 etag=digest or True, conditional=True)
+    if digest:
+        rv.cache_control.no_cache = None
+        rv.cache_control.private = True
+        rv.cache_control.max_age = DOWNLOAD_MAX_AGE
+    return rv
+
+def _offload_response(root, rel_path, download_name, digest):
+    path = safe_join(root, rel_path)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    st = os.stat(path)
+    rv = Response(mimetype=mimetypes.guess_type(download_name)[0] or "application/octet-stream")
+    rv.headers.set("Content-Disposition", "attachment", filename=download_name)
+    rv.set_etag(digest or f"{st.st_mtime}-{st.st_size}")
+    rv.last_modified = st.st_mtime
+    # answer revalidation here; the body and any Range are the proxy's job
+    rv = rv.make_conditional(request)
+    if rv.status_code == 304:
+        return rv
+    if DOWNLOAD_OFFLOAD == "x-accel":
+        rv.headers["X-Accel-Redirect"] = DOWNLOAD_ACCEL_PREFIX.rstrip("/") + "/" + rel_path
+    else:
+        rv.headers["X-Sendfile"] = os.path.abspath(path)
+    return rv
@@ -0,0 +1,84 @@
+# Outbox delivery against a local SMTP stand-in (aiosmtpd, in-process).
+# Needs the PG_* database; SMTP settings are pointed at the stand-in below.
+#   python test_email_queue.py      (or: python -m pytest test_email_queue.py)
+import os
+import socket
+import uuid
+from email import message_from_bytes
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+SMTP_PORT = _free_port()
+# before importing email_queue: load_dotenv() does not override these
+os.environ.update(SMTP_HOST="127.0.0.1", SMTP_PORT=str(SMTP_PORT), SMTP_STARTTLS="0",
+                  EMAIL_ADDR="portal@example.com", EMAIL_APP_PASSWORD="", EMAIL_RETRY_BASE="30")
+
+from aiosmtpd.controller import Controller
+
+import email_queue
+from db import execute_query
+from email_queue import EmailDispatcher, enqueue_email
+
+class _Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, message_from_bytes(envelope.content)))
+        return "250 OK"
+
+def _row(msg_id):
+    return execute_query(
+        "SELECT status, attempts, sent_at IS NOT NULL, last_error, next_attempt_at > NOW() "
+        "FROM EmailOutbox WHERE id = %s", (msg_id,), fetch=True)[0]
+
+def _send_only(msg_id):
+    # claim by id: other rows in the shared outbox are neither sent nor touched
+    return EmailDispatcher(workers=1).run_once(ids=[msg_id])
+
+def test_delivers_and_marks_sent():
+    inbox = _Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+    subject = f"outbox test {uuid.uuid4()}"
+    msg_id = enqueue_email("student@example.com", subject, "hello from the outbox")
+    other_id = enqueue_email("other@example.com", f"outbox test {uuid.uuid4()}", "not part of this test")
+    try:
+        assert _send_only(msg_id) == (1, 0)
+    finally:
+        controller.stop()
+        status, attempts, has_sent_at, last_error, _ = _row(msg_id)
+        other = _row(other_id)
+        execute_query("DELETE FROM EmailOutbox WHERE id = ANY(%s)", ([msg_id, other_id],))
+
+    delivered = [(rcpt, m) for rcpt, m in inbox.messages if m["Subject"] == subject]
+    assert len(delivered) == 1, inbox.messages
+    rcpt, message = delivered[0]
+    assert rcpt == ["student@example.com"]
+    assert message["From"] == "portal@example.com"
+    assert message.get_payload().strip() == "hello from the outbox"
+    assert (status, attempts, has_sent_at, last_error) == ("sent", 1, True, None)
+    assert other[:3] == ("pending", 0, False)
+
+def test_failed_delivery_is_rescheduled():
+    # nothing listens on this port: the send fails and the row goes back to pending with backoff
+    email_queue.SMTP_PORT = _free_port()
+    msg_id = enqueue_email("student@example.com", f"outbox test {uuid.uuid4()}", "never delivered")
+    try:
+        assert _send_only(msg_id) == (0, 1)
+        status, attempts, has_sent_at, last_error, backed_off = _row(msg_id)
+    finally:
+        email_queue.SMTP_PORT = SMTP_PORT
+        execute_query("DELETE FROM EmailOutbox WHERE id = %s", (msg_id,))
+
+    assert (status, attempts, has_sent_at) == ("pending", 1, False)
+    assert last_error and backed_off
+
+if __name__ == "__main__":
+    test_delivers_and_marks_sent()
+    print("✔ queued email delivered over SMTP and marked sent")
+    test_failed_delivery_is_rescheduled()
+    print("✔ failed delivery rescheduled with backoff")
@@ -0,0 +1,74 @@
+# Parity check: the NumPy artifact must score exactly like the sklearn pipeline
+# it was exported from. Needs no database.
+#   python test_model_artifact.py      (or: python -m pytest test_model_artifact.py)
+import os
+import sys
+import tempfile
+import subprocess
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+
+from model_artifact import LinearRiskModel, export
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def _data(n=2000, seed=0):
+    # same feature ranges as ml_model: avg marks, attendance %, subjects below threshold
+    rng = np.random.RandomState(seed)
+    X = np.column_stack([rng.uniform(0, 100, n), rng.uniform(0, 100, n), rng.randint(0, 7, n)]).astype(float)
+    y = ((X[:, 1] < 60) | (X[:, 2] >= 3)).astype(int)
+    return X, y
+
+def _pipelines():
+    X, y = _data()
+    lr = Pipeline([("scaler", StandardScaler()), ("clf", LogisticRegression(max_iter=1000))]).fit(X, y)
+    sgd = Pipeline([("scaler", StandardScaler()),
+                    ("clf", SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42))]).fit(X, y)
+    return {"logistic_regression": lr, "sgd_log_loss": sgd}
+
+def _check_parity(pipeline):
+    X, _ = _data(n=5000, seed=1)
+    # include extremes, where a naive sigmoid would overflow
+    X = np.vstack([X, [[0, 0, 6], [100, 100, 0], [-1e6, 1e6, 50]]])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "risk_model.npz")
+        export(pipeline, path, feature_names=("avg_marks", "attendance_pct", "below_count"))
+        model = LinearRiskModel.load(path)
+
+    expected = pipeline.predict_proba(X)
+    got = model.predict_proba(X)
+    assert list(model.classes_) == list(pipeline.classes_)
+    assert got.shape == expected.shape
+    assert np.allclose(got, expected, rtol=0, atol=1e-12), np.abs(got - expected).max()
+    assert np.array_equal(model.predict(X), pipeline.predict(X))
+    assert model.meta["feature_names"] == ["avg_marks", "attendance_pct", "below_count"]
+    return np.abs(got - expected).max()
+
+def test_parity_logistic_regression():
+    _check_parity(_pipelines()["logistic_regression"])
+
+def test_parity_sgd():
+    _check_parity(_pipelines()["sgd_log_loss"])
+
+def test_training_watermark_round_trip():
+    pipeline = _pipelines()["logistic_regression"]
+    pipeline.training_watermark_ = 1234
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "risk_model.npz")
+        export(pipeline, path)
+        assert LinearRiskModel.load(path).training_watermark_ == 1234
+
+def test_scoring_does_not_import_sklearn():
+    code = ("import sys, model_artifact; "
+            "assert 'sklearn' not in sys.modules and 'joblib' not in sys.modules")
+    subprocess.check_call([sys.executable, "-c", code], cwd=HERE)
+
+if __name__ == "__main__":
+    for name, pipeline in _pipelines().items():
+        print(f"✔ {name:<20} max |Δp| = {_check_parity(pipeline):.2e}")
+    test_training_watermark_round_trip()
+    print("✔ training watermark round-trips")
+    test_scoring_does_not_import_sklearn()
+    print("✔ model_artifact imports without sklearn / joblib")
@@ -1,10 +1,29 @@
-import time
-from ml_model import train_and_save_model
+import argparse
+from ml_model import train_and_save_model, predict_all_students, profile
 
-print("⏱ Starting training...\n")
+# Time each stage of training (and optionally of scoring every student).
+#   python train_timer.py                               stage timings for training
+#   python train_timer.py --predict --memory            scoring, with peak memory per stage
+#   python train_timer.py --cprofile --out train.json   hottest functions per stage, saved as JSON
+parser = argparse.ArgumentParser(description="Profile risk model training / scoring stage by stage.")
+parser.add_argument("--predict", action="store_true", help="profile predict_all_students(notify=False) instead")
+parser.add_argument("--cprofile", action="store_true", help="cProfile each stage (top functions in the report)")
+parser.add_argument("--memory", action="store_true", help="tracemalloc peak per stage")
+parser.add_argument("--out", help="write the JSON report here")
+args = parser.parse_args()
 
-start = time.time()
-train_and_save_model()
-end = time.time()
+fn = predict_all_students if args.predict else train_and_save_model
+kwargs = {"notify": False} if args.predict else {}
 
-print(f"\n⏳ Training completed in {end - start:.4f} seconds\n")
+print(f"⏱ Starting {'scoring' if args.predict else 'training'}...\n")
+
+_, report = profile(fn, cprofile=args.cprofile, memory=args.memory, report_path=args.out, **kwargs)
+
+for st in report["stages"]:
+    extra = f"  {st['peak_kb']:>10.1f} KB peak" if "peak_kb" in st else ""
+    print(f"  {'  ' * st['depth']}{st['stage'].rsplit('/', 1)[-1]:<{30 - 2 * st['depth']}} "
+          f"{st['seconds']:>9.4f}s  {st['queries']:>4} q{extra}")
+
+print(f"\n⏳ Completed in {report['total_seconds']:.4f} seconds\n")
+if args.out:
+    print(f"📁 Report written to {args.out}")